@@ -0,0 +1,60 @@
+"""Cost of a boot that joins a saved network, measured in a fresh interpreter.
+
+``run.py`` starts this script in a subprocess, in a directory holding a
+``wifi.dat`` for ``Network01``, and reads the JSON object it prints.
+"""
+
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import fakes  # noqa: E402 (installs the fake MicroPython modules)
+
+
+def main():
+    sta = fakes.network.WLAN(fakes.network.STA_IF)
+    sta.networks = [(b"Network01", bytes(6), 1, -40, 3, False)]
+    sta.passwords = {"Network01": "secret01"}
+
+    # Otherwise the peak depends on when the garbage left by earlier imports is collected
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        from wifi_manager.manager import WifiManager
+
+        if not WifiManager(reboot=False).try_connect():
+            raise SystemExit("the saved network did not connect")
+    boot_us = (time.perf_counter() - start) * 1e6
+    boot_peak = tracemalloc.get_traced_memory()[1]
+    if "wifi_manager.webserver" in sys.modules:
+        raise SystemExit("the portal was loaded on the happy path")
+
+    # What the happy path no longer pays for
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    import wifi_manager.webserver  # noqa: F401
+
+    portal_us = (time.perf_counter() - start) * 1e6
+    portal_peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    json.dump(
+        {
+            "boot.happy_path": [boot_us, "us"],
+            "boot.happy_path.peak": [boot_peak, "bytes"],
+            "boot.portal_import": [portal_us, "us"],
+            "boot.portal_import.peak": [portal_peak, "bytes"],
+        },
+        sys.stdout,
+    )
+
+
+if __name__ == "__main__":
+    main()
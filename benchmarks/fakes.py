@@ -0,0 +1,177 @@
+"""Stand-ins for the MicroPython ``network`` and ``machine`` modules and for client sockets.
+
+Import this module before anything from ``wifi_manager``.
+"""
+
+import random
+import sys
+import time
+import types
+
+
+class FakeWLAN:
+    """A WLAN interface that connects instantly to the networks in ``passwords``."""
+
+    def __init__(self, interface, networks=(), passwords=None):
+        self.interface = interface
+        self.networks = list(networks)
+        self.passwords = passwords or {}
+        self.connected = False
+        self.active_state = False
+
+    def active(self, state=None):
+        if state is None:
+            return self.active_state
+        self.active_state = state
+
+    def config(self, **kwargs):
+        pass
+
+    def scan(self):
+        return list(self.networks)
+
+    def connect(self, ssid, password, bssid=None):
+        self.connected = self.passwords.get(ssid) == password
+
+    def disconnect(self):
+        self.connected = False
+
+    def isconnected(self):
+        return self.connected
+
+    def status(self):
+        return network.STAT_GOT_IP if self.connected else network.STAT_CONNECTING
+
+    def ifconfig(self):
+        return ("192.168.4.1", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+
+
+class SimulatedWLAN(FakeWLAN):
+    """A FakeWLAN with radio latency and failure modes, on the real clock.
+
+    ``scan()`` blocks for ``scan_ms``. A connection settles ``connect_ms``
+    after ``connect()``, reporting ``STAT_CONNECTING`` until then, and ends
+    connected, or with ``STAT_WRONG_PASSWORD`` or ``STAT_NO_AP_FOUND``. SSIDs
+    in ``stalls`` never settle, and ``drop_rate`` fails that fraction of the
+    good connections with ``STAT_CONNECT_FAIL``.
+    """
+
+    def __init__(
+        self,
+        interface,
+        networks=(),
+        passwords=None,
+        scan_ms=0,
+        connect_ms=0,
+        stalls=(),
+        drop_rate=0.0,
+        seed=0,
+    ):
+        super().__init__(interface, networks, passwords)
+        self.scan_ms = scan_ms
+        self.connect_ms = connect_ms
+        self.stalls = set(stalls)
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.pending = None  # (settles at, final status) of the connection in progress
+        self.final_status = network.STAT_IDLE
+
+    def scan(self):
+        time.sleep(self.scan_ms / 1000)
+        return list(self.networks)
+
+    def connect(self, ssid, password, bssid=None):
+        self.connected = False
+        if ssid in self.stalls:
+            status = None
+        elif not any(entry[0].decode() == ssid for entry in self.networks):
+            status = network.STAT_NO_AP_FOUND
+        elif self.passwords.get(ssid) != password:
+            status = network.STAT_WRONG_PASSWORD
+        elif self.random.random() < self.drop_rate:
+            status = network.STAT_CONNECT_FAIL
+        else:
+            status = network.STAT_GOT_IP
+        self.pending = (time.monotonic() + self.connect_ms / 1000, status)
+
+    def _settle(self):
+        if self.pending is None or time.monotonic() < self.pending[0]:
+            return
+        status = self.pending[1]
+        if status is None:
+            return
+        self.pending = None
+        self.final_status = status
+        self.connected = status == network.STAT_GOT_IP
+
+    def disconnect(self):
+        self.pending = None
+        self.connected = False
+        self.final_status = network.STAT_IDLE
+
+    def isconnected(self):
+        self._settle()
+        return self.connected
+
+    def status(self):
+        self._settle()
+        return network.STAT_CONNECTING if self.pending else self.final_status
+
+
+network = types.ModuleType("network")
+network.STA_IF = 0
+network.AP_IF = 1
+network.STAT_IDLE = 1000
+network.STAT_CONNECTING = 1001
+network.STAT_GOT_IP = 1010
+network.STAT_NO_AP_FOUND = 201
+network.STAT_WRONG_PASSWORD = 202
+network.STAT_CONNECT_FAIL = 203
+network.interfaces = {}
+
+
+def _wlan(interface):
+    if interface not in network.interfaces:
+        network.interfaces[interface] = FakeWLAN(interface)
+    return network.interfaces[interface]
+
+
+network.WLAN = _wlan
+
+machine = types.ModuleType("machine")
+machine.reset = lambda: None
+
+sys.modules.setdefault("network", network)
+sys.modules.setdefault("machine", machine)
+
+if not hasattr(time, "sleep_ms"):
+    # WifiManager polls the connection with MicroPython's time.sleep_ms
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+
+class FakeClient:
+    """A connected client socket that sends ``request`` and discards the response."""
+
+    def __init__(self, request):
+        self.request = request
+        self.offset = 0
+        self.sent = 0
+
+    def settimeout(self, timeout):
+        pass
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.request) - self.offset)
+        buffer[:size] = self.request[self.offset : self.offset + size]
+        self.offset += size
+        return size
+
+    def send(self, data):
+        self.sent += len(data)
+        return len(data)
+
+    def sendall(self, data):
+        self.sent += len(data)
+
+    def close(self):
+        pass
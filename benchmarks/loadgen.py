@@ -0,0 +1,203 @@
+"""Concurrent-client load test of the portal, on a simulated radio.
+
+Starts a ``WebServer`` on a localhost port, opens ``--clients`` concurrent
+HTTP clients against it, some of them slow (trickling their request), and
+reports throughput, latency percentiles and error rates:
+
+    PYTHONPATH=src python benchmarks/loadgen.py --clients 10 --slow 2 --mode async
+
+Configure requests use a wrong password, so they exercise the simulated
+connect latency and the configure cooldown without ending the portal.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import fakes  # noqa: E402 (installs the fake MicroPython modules)
+from wifi_manager.manager import WifiManager  # noqa: E402
+from wifi_manager.webserver import WebServer  # noqa: E402
+
+HOST = "127.0.0.1"
+# Relative weight of each request in the mix
+REQUESTS = (
+    (4, b"GET / HTTP/1.1\r\nHost: 192.168.4.1\r\nConnection: close\r\n\r\n"),
+    (3, b"GET /api/networks HTTP/1.1\r\nHost: 192.168.4.1\r\nConnection: close\r\n\r\n"),
+    (2, b"GET /api/status HTTP/1.1\r\nHost: 192.168.4.1\r\nConnection: close\r\n\r\n"),
+    (
+        1,
+        b"POST /api/configure HTTP/1.1\r\nHost: 192.168.4.1\r\nConnection: close\r\n"
+        b"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: 29\r\n\r\n"
+        b"ssid=Network01&password=wrong",
+    ),
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _radio(args):
+    """Install a simulated STA interface, as the manager is about to create it."""
+    sta = fakes.SimulatedWLAN(
+        fakes.network.STA_IF,
+        networks=[
+            (b"Network%02d" % i, bytes(6), 1 + i % 11, -40 - i, 3, False)
+            for i in range(args.networks)
+        ],
+        passwords={"Network01": "secret01"},
+        scan_ms=args.scan_ms,
+        connect_ms=args.connect_ms,
+        drop_rate=args.drop_rate,
+        seed=args.seed,
+    )
+    fakes.network.interfaces[fakes.network.STA_IF] = sta
+    return sta
+
+
+def _request(port, request, slow_delay):
+    """Send one request and read the response. Returns (status, seconds)."""
+    start = time.perf_counter()
+    with socket.create_connection((HOST, port), timeout=30) as sock:
+        if slow_delay:
+            for offset in range(0, len(request), 16):
+                sock.sendall(request[offset : offset + 16])
+                time.sleep(slow_delay)
+        else:
+            sock.sendall(request)
+        response = b""
+        while True:
+            chunk = sock.recv(1024)
+            if not chunk:
+                break
+            response += chunk
+    status = int(response.split(b" ", 2)[1]) if response.startswith(b"HTTP/") else 0
+    return status, time.perf_counter() - start
+
+
+def _client(port, count, slow_delay, rng, results, lock):
+    weights = [weight for weight, _ in REQUESTS]
+    requests = [request for _, request in REQUESTS]
+    for request in rng.choices(requests, weights, k=count):
+        try:
+            outcome = _request(port, request, slow_delay)
+        except OSError as error:
+            outcome = (type(error).__name__, None)
+        with lock:
+            results.append(outcome)
+
+
+def _percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, (len(values) * percent + 99) // 100 - 1)]
+
+
+def report(results, elapsed, args):
+    latencies = [seconds * 1000 for status, seconds in results if seconds is not None]
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(1 for status, seconds in results if seconds is None or status == 0)
+    return {
+        "mode": args.mode,
+        "clients": args.clients,
+        "slow_clients": args.slow,
+        "backlog": args.backlog,
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "latency_ms": {
+            name: round(_percentile(latencies, percent), 2) if latencies else None
+            for name, percent in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "error_rate": round(errors / len(results), 4) if results else 0,
+        "statuses": statuses,
+    }
+
+
+def run(args):
+    sta = _radio(args)
+    manager = WifiManager(reboot=False)
+    server = WebServer(manager, reset_fn=lambda: None)
+    server.captive_dns = False
+    server.client_timeout = args.client_timeout
+    server.sta_poll_interval = 0.05
+    port = _free_port()
+    if args.mode == "async":
+        target = server.run_async
+    else:
+        target = server.run
+    thread = threading.Thread(target=target, args=(HOST, port, args.backlog), daemon=True)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        thread.start()
+        time.sleep(0.2)  # Let the server bind
+
+        results = []
+        lock = threading.Lock()
+        clients = [
+            threading.Thread(
+                target=_client,
+                args=(
+                    port,
+                    args.requests,
+                    args.slow_delay_ms / 1000 if index < args.slow else 0,
+                    random.Random(args.seed + index),
+                    results,
+                    lock,
+                ),
+            )
+            for index in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - start
+
+        # Connecting the STA ends the portal once the configure cooldown is over
+        sta.pending = None
+        sta.connected = True
+        thread.join(server.configure_cooldown_ms / 1000 + 5)
+    return report(results, elapsed, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("sync", "async"), default="async")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--slow", type=int, default=0, help="how many clients are slow")
+    parser.add_argument("--slow-delay-ms", type=int, default=50, help="per 16-byte chunk")
+    parser.add_argument("--backlog", type=int, default=5, help="listen backlog")
+    parser.add_argument("--client-timeout", type=float, default=5.0, help="server side, in s")
+    parser.add_argument("--networks", type=int, default=20, help="networks in range")
+    parser.add_argument("--scan-ms", type=int, default=0, help="simulated scan latency")
+    parser.add_argument("--connect-ms", type=int, default=0, help="simulated connect latency")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="failed good connects")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Host-side benchmarks for the wifi_manager hot paths.
+
+Writes a JSON report and compares it against a stored baseline:
+
+    PYTHONPATH=src python benchmarks/run.py --output bench_report.json
+    PYTHONPATH=src python benchmarks/run.py --save-baseline
+
+Exits with status 1 if a memory metric regressed past its tolerance. Time
+and throughput depend on the machine, so they are only shown next to their
+ratio to the baseline.
+"""
+
+import argparse
+import compileall
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import fakes  # noqa: E402 (installs the fake MicroPython modules)
+import bench_form  # noqa: E402
+import wifi_manager  # noqa: E402
+from wifi_manager.credentials import CredentialStore  # noqa: E402
+from wifi_manager.manager import WifiManager  # noqa: E402
+from wifi_manager.network_utils import url_decode  # noqa: E402
+from wifi_manager.webserver import WebServer  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+BOOT_SCRIPT = os.path.join(os.path.dirname(__file__), "bench_boot.py")
+# Allowed ratio to the baseline before a metric counts as a regression. Allocation sizes are
+# deterministic; timings recorded on another machine are not comparable, so they never fail
+TOLERANCE = {"bytes": 1.1}
+
+REQUESTS = {
+    "root": b"GET / HTTP/1.1\r\nHost: 192.168.4.1\r\nAccept: text/html\r\n\r\n",
+    "configure": (
+        b"POST /configure HTTP/1.1\r\nHost: 192.168.4.1\r\n"
+        b"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: 32\r\n\r\n"
+        b"ssid=Network01&password=secret01"
+    ),
+    "api_networks": b"GET /api/networks HTTP/1.1\r\nHost: 192.168.4.1\r\n\r\n",
+    "not_found": b"GET /generate_204 HTTP/1.1\r\nHost: connectivitycheck.gstatic.com\r\n\r\n",
+}
+
+
+def best_time_us(fn, repeat=5, number=200):
+    """Best average duration of fn() in microseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = (time.perf_counter() - start) * 1e6 / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_bytes(fn):
+    """Peak traced allocation of one fn() call, after a warm-up call."""
+    fn()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def _server():
+    sta = fakes.network.WLAN(fakes.network.STA_IF)
+    sta.networks = [
+        (b"Network%02d" % i, bytes(6), 1 + i % 11, -40 - i, 3, False) for i in range(20)
+    ]
+    sta.passwords = {"Network01": "secret01"}
+    manager = WifiManager(reboot=False)
+    return WebServer(manager, reset_fn=lambda: None)
+
+
+def bench_requests(results):
+    server = _server()
+    for name, request in REQUESTS.items():
+
+        def handle(request=request):
+            server.manager.wlan_sta.disconnect()
+            server._handle_client(fakes.FakeClient(request))
+
+        results[f"handle_client.{name}"] = (best_time_us(handle, number=50), "us")
+        results[f"handle_client.{name}.peak"] = (peak_bytes(handle), "bytes")
+
+
+def bench_forms(results):
+    for name, body in bench_form.PAYLOADS.items():
+        request = bench_form.HEADERS + body
+        results[f"url_decode.{name}"] = (bench_form.measure(url_decode, request), "ops/s")
+        results[f"parse_form.{name}"] = (bench_form.measure(bench_form._new, body), "ops/s")
+
+
+def bench_credentials(results, directory):
+    for count in (1, 8, 32):
+        path = os.path.join(directory, f"wifi{count}.dat")
+        profiles = {f"Network{i:02d}": f"password{i:02d}" for i in range(count)}
+        CredentialStore(path, max_profiles=count).replace(profiles)
+
+        def load():
+            CredentialStore(path, max_profiles=count).load()
+
+        store = CredentialStore(path, max_profiles=count)
+        passwords = iter(range(10**9))
+
+        def update():
+            store.set("Network00", f"changed{next(passwords)}")
+
+        def replace():
+            profiles["Network00"] = f"replaced{next(passwords)}"
+            CredentialStore(path, max_profiles=count).replace(profiles)
+
+        results[f"credentials.load.{count}"] = (best_time_us(load, number=50), "us")
+        results[f"credentials.update.{count}"] = (best_time_us(update, number=50), "us")
+        results[f"credentials.replace.{count}"] = (best_time_us(replace, number=50), "us")
+
+
+def bench_boot(results, directory, repeat=3):
+    """Best of several fresh-interpreter boots; imports are only cold in a new process."""
+    CredentialStore(os.path.join(directory, "wifi.dat")).replace({"Network01": "secret01"})
+    source = os.path.dirname(os.path.dirname(wifi_manager.__file__))
+    # Load the modules from fresh bytecode, as they are from .mpy files on a device; compiling
+    # them from source would dominate the peak whenever PYTHONDONTWRITEBYTECODE is set
+    compileall.compile_dir(source, quiet=1)
+    # PYTHONPATH may be relative to the directory run.py was started from
+    env = dict(os.environ, PYTHONPATH=source)
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, BOOT_SCRIPT], cwd=directory, env=env, capture_output=True, check=True
+        ).stdout
+        for name, (value, unit) in json.loads(output).items():
+            if name not in results or value < results[name][0]:
+                results[name] = (value, unit)
+
+
+def run():
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            # The portal prints progress; keep it out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                bench_requests(results)
+                bench_credentials(results, directory)
+            bench_boot(results, directory)
+        finally:
+            os.chdir(cwd)
+    bench_forms(results)
+    return {
+        name: {"value": round(value, 2), "unit": unit} for name, (value, unit) in results.items()
+    }
+
+
+def _ratio(old, new, unit):
+    """How many times worse the new value is: throughput is better when higher."""
+    if unit == "ops/s":
+        return old / new if new else 1
+    return new / old if old else 1
+
+
+def compare(report, baseline):
+    """Return the metrics that regressed past their tolerance against the baseline."""
+    regressions = []
+    for name, metric in report.items():
+        if name not in baseline or metric["unit"] not in TOLERANCE:
+            continue
+        old, new, unit = baseline[name]["value"], metric["value"], metric["unit"]
+        if _ratio(old, new, unit) > TOLERANCE[unit]:
+            regressions.append((name, old, new, unit))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store as the new baseline")
+    args = parser.parse_args()
+
+    report = run()
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    for name, metric in report.items():
+        line = f"{name:<36}{metric['value']:>14.2f} {metric['unit']:<6}"
+        if name in baseline:
+            ratio = _ratio(baseline[name]["value"], metric["value"], metric["unit"])
+            line += f" x{ratio:.2f} of baseline"
+        print(line)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        return 0
+    regressions = compare(report, baseline)
+    for name, old, new, unit in regressions:
+        print(f"REGRESSION {name}: {old} -> {new} {unit}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,15 @@
 from wifi_manager.manager import WifiManager
-import utime
+from wifi_manager.supervisor import ConnectionSupervisor
+import asyncio
 
 # Example of usage
 
 wm = WifiManager()
 wm.connect()
 
-while True:
-    if wm.is_connected():
-        print("Connected!")
-    else:
-        print("Disconnected!")
-    utime.sleep(10)
+supervisor = ConnectionSupervisor(
+    wm,
+    on_connect=lambda: print("Connected!"),
+    on_disconnect=lambda: print("Disconnected!"),
+)
+asyncio.run(supervisor.run())
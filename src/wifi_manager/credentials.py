@@ -0,0 +1,185 @@
+import os
+
+MAGIC = b"WMC\x01"
+# Longest SSID and WPA passphrase, in bytes; each is stored behind a one-byte length
+MAX_SSID = 32
+MAX_PASSWORD = 64
+# Password length marking a removed profile
+_REMOVED = 0xFF
+
+
+def _decode(data):
+    """Decode UTF-8 bytes, or return None if they are corrupt."""
+    try:
+        return bytes(data).decode("utf-8")
+    except UnicodeError:
+        return None
+
+
+def _check(ssid, password):
+    """Raise ValueError for a profile that cannot be stored or joined."""
+    if not 0 < len(ssid.encode("utf-8")) <= MAX_SSID:
+        raise ValueError("SSID must be 1 to %d bytes" % MAX_SSID)
+    if password is not None and len(password.encode("utf-8")) > MAX_PASSWORD:
+        raise ValueError("Password must be at most %d bytes" % MAX_PASSWORD)
+
+
+def _record(ssid, password):
+    ssid = ssid.encode("utf-8")
+    if password is None:
+        return bytes((len(ssid),)) + ssid + bytes((_REMOVED,))
+    password = password.encode("utf-8")
+    return bytes((len(ssid),)) + ssid + bytes((len(password),)) + password
+
+
+class CredentialStore:
+    """Saved WiFi profiles, kept in memory and persisted as an append-only log.
+
+    The file is ``MAGIC`` followed by ``<len><ssid><len><password>`` records,
+    where a later record for the same SSID replaces an earlier one. Updates
+    append a single record; the file is rewritten through a temporary file
+    and a rename only when the log grows too long or a profile is evicted.
+    Files in the old ``ssid;password`` text format are read and migrated on
+    the next write.
+    """
+
+    def __init__(self, path, max_profiles=8):
+        self.path = path
+        self.max_profiles = max_profiles
+        self._profiles = None
+        self._order = []  # SSIDs, least recently updated first
+        self._records = 0  # Records in the file, including superseded ones
+        self._rewrite = True  # The file must be rewritten before appending
+
+    def load(self):
+        """Return the saved profiles as a dict of SSID to password."""
+        if self._profiles is None:
+            self._profiles = {}
+            self._order = []
+            data = self._read(self.path)
+            recovered = data is None
+            if recovered:
+                # Interrupted between removing the old file and the rename
+                data = self._read(self.path + ".tmp")
+            if data is not None and data.startswith(MAGIC):
+                self._parse(data)
+            elif data is not None:
+                self._parse_legacy(data)
+            self._rewrite = self._rewrite or recovered
+        return self._profiles
+
+    def get(self, ssid):
+        return self.load().get(ssid)
+
+    def set(self, ssid, password):
+        """Save a profile. Returns False when it was already saved as is.
+
+        Raises ValueError, before changing anything, if the SSID or password is too long.
+        """
+        _check(ssid, password)
+        profiles = self.load()
+        if profiles.get(ssid) == password:
+            return False
+        if ssid not in profiles and len(profiles) >= self.max_profiles:
+            del profiles[self._order.pop(0)]
+            self._rewrite = True
+        self._update(ssid, password)
+        self._persist(ssid, password)
+        return True
+
+    def remove(self, ssid):
+        if ssid not in self.load():
+            return False
+        self._update(ssid, None)
+        self._persist(ssid, None)
+        return True
+
+    def replace(self, profiles):
+        """Replace all saved profiles, rewriting the file only if they changed."""
+        for ssid, password in profiles.items():
+            _check(ssid, password)
+        if self.load() == profiles:
+            return False
+        self._profiles = {}
+        self._order = []
+        for ssid, password in profiles.items():
+            self._update(ssid, password)
+        while len(self._order) > self.max_profiles:
+            del self._profiles[self._order.pop(0)]
+        self._write()
+        return True
+
+    def _update(self, ssid, password):
+        if ssid in self._profiles:
+            self._order.remove(ssid)
+            del self._profiles[ssid]
+        if password is not None:
+            self._profiles[ssid] = password
+            self._order.append(ssid)
+
+    def _persist(self, ssid, password):
+        if self._rewrite or self._records >= 2 * self.max_profiles:
+            self._write()
+            return
+        with open(self.path, "ab") as file:
+            file.write(_record(ssid, password))
+        self._records += 1
+
+    def _write(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(MAGIC)
+            for ssid in self._order:
+                file.write(_record(ssid, self._profiles[ssid]))
+        try:
+            os.rename(temp_path, self.path)
+        except OSError:
+            # Some filesystems (FAT) refuse to rename over an existing file
+            os.remove(self.path)
+            os.rename(temp_path, self.path)
+        self._records = len(self._order)
+        self._rewrite = False
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _parse(self, data):
+        view = memoryview(data)
+        index = len(MAGIC)
+        records = 0
+        corrupt = False
+        while index < len(data):
+            size = data[index]
+            end = index + 1 + size
+            if end >= len(data):
+                break  # Truncated record from an interrupted append
+            ssid = _decode(view[index + 1 : end])
+            size = data[end]
+            if size == _REMOVED:
+                password = None
+                index = end + 1
+            else:
+                index = end + 1 + size
+                if index > len(data):
+                    break
+                password = _decode(view[end + 1 : index])
+            records += 1
+            if ssid is None or (size != _REMOVED and password is None):
+                corrupt = True  # Skipped, and dropped by the next write
+                continue
+            self._update(ssid, password)
+        self._records = records
+        self._rewrite = corrupt or index != len(data)
+
+    def _parse_legacy(self, data):
+        for line in data.split(b"\n"):
+            ssid, separator, password = line.rstrip(b"\r").partition(b";")
+            ssid, password = _decode(ssid), _decode(password)
+            if separator and ssid and password is not None:
+                self._update(ssid, password)
+        self._rewrite = True
@@ -0,0 +1,99 @@
+import socket
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# Answer record: pointer to the question name, type A, class IN, TTL 60 s, 4 bytes of address
+_ANSWER = b"\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x3c\x00\x04"
+
+
+class DNSServer:
+    """Captive-portal DNS responder answering every A query with one address.
+
+    Queries are answered in place, in a preallocated buffer: the question is
+    kept, the header flags and counts are patched and the answer record is
+    appended after it. Other query types get an empty answer, so clients
+    fall back to IPv4.
+    """
+
+    def __init__(self, ip, port=53):
+        self.port = port
+        self.answer = _ANSWER + bytes(int(part) for part in ip.split("."))
+        self.buffer = bytearray(512)
+        self.view = memoryview(self.buffer)
+        self.socket = None
+        self._fileno = None
+
+    def open(self, host=""):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, self.port))
+        sock.setblocking(False)
+        self.socket = sock
+        # select.poll() reports file descriptors on CPython and sockets on MicroPython
+        self._fileno = sock.fileno() if hasattr(sock, "fileno") else None
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def owns(self, obj):
+        """Whether an object returned by select.poll() refers to this server's socket."""
+        return obj is self.socket or (self._fileno is not None and obj == self._fileno)
+
+    def build_response(self, size):
+        """Turn the query in the buffer into its response. Returns its size, or 0 to drop it."""
+        buffer = self.buffer
+        # A single-question standard query
+        if size < 12 or buffer[2] & 0xF8 or buffer[4] or buffer[5] != 1:
+            return 0
+        index = 12
+        while index < size and buffer[index]:
+            if buffer[index] & 0xC0:
+                return 0
+            index += buffer[index] + 1
+        end = index + 5  # Root label, type and class
+        answer = self.answer
+        if end > size or end + len(answer) > len(buffer):
+            return 0
+        is_a = buffer[index + 1] == 0 and buffer[index + 2] == 1
+        buffer[2] = 0x84 | (buffer[2] & 0x01)  # Authoritative response, keep RD
+        buffer[3] = 0
+        buffer[7] = 1 if is_a else 0
+        buffer[6] = buffer[8] = buffer[9] = buffer[10] = buffer[11] = 0
+        if not is_a:
+            return end
+        for offset in range(len(answer)):
+            buffer[end + offset] = answer[offset]
+        return end + len(answer)
+
+    def handle(self):
+        """Answer one pending query. Returns False when none was waiting."""
+        sock = self.socket
+        try:
+            if hasattr(sock, "recvfrom_into"):
+                size, address = sock.recvfrom_into(self.buffer)
+            else:
+                # MicroPython sockets only provide recvfrom
+                data, address = sock.recvfrom(len(self.buffer))
+                size = len(data)
+                self.buffer[:size] = data
+        except OSError:
+            return False
+        size = self.build_response(size)
+        if size:
+            try:
+                sock.sendto(self.view[:size], address)
+            except OSError:
+                pass
+        return True
+
+    async def serve(self, interval=0.05):
+        """Answer queries until cancelled, checking the socket every ``interval`` seconds."""
+        while True:
+            while self.handle():
+                pass
+            await asyncio.sleep(interval)
@@ -0,0 +1,101 @@
+import json
+from binascii import hexlify, unhexlify
+
+# Score bonus, in dB, for a profile that always connected (a penalty if it never did)
+HISTORY_WEIGHT = 20
+# Counters are halved past this total so recent attempts dominate the score
+MAX_ATTEMPTS = 16
+# Connection durations kept per profile to size its connect timeout
+MAX_DURATIONS = 8
+# The timeout is 1.5 times the 90th percentile duration plus this margin, within the bounds
+TIMEOUT_MARGIN_MS = 1000
+MIN_TIMEOUT_MS = 2000
+MAX_TIMEOUT_MS = 20000
+
+
+class ConnectionHistory:
+    """Per-profile connection successes, failures and durations, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self.dirty = False
+
+    def load(self):
+        if self.data is None:
+            try:
+                with open(self.path) as file:
+                    self.data = json.load(file)
+            except (OSError, ValueError):
+                self.data = {"profiles": {}}
+        return self.data
+
+    def save(self):
+        if not self.dirty:
+            return
+        with open(self.path, "w") as file:
+            json.dump(self.data, file)
+        self.dirty = False
+
+    def _record(self, ssid, index):
+        profiles = self.load()["profiles"]
+        counts = profiles.get(ssid) or [0, 0]
+        if counts[index] >= MAX_ATTEMPTS and not counts[1 - index]:
+            return  # Saturated, skip the flash write
+        counts[index] += 1
+        if counts[0] + counts[1] > MAX_ATTEMPTS:
+            counts[0] //= 2
+            counts[1] //= 2
+        profiles[ssid] = counts
+        self.dirty = True
+
+    def record_success(self, ssid):
+        self._record(ssid, 0)
+
+    def record_failure(self, ssid):
+        self._record(ssid, 1)
+
+    def record_duration(self, ssid, duration_ms):
+        """Remember how long a connection took, or how long it was waited for in vain."""
+        durations = self.load().setdefault("durations", {})
+        before = self.timeout_ms(ssid)
+        samples = durations.get(ssid) or []
+        samples.append(duration_ms)
+        if len(samples) > MAX_DURATIONS:
+            samples.pop(0)
+        durations[ssid] = samples
+        # Only a change of the derived timeout is worth a flash write
+        if self.timeout_ms(ssid) != before:
+            self.dirty = True
+
+    def timeout_ms(self, ssid, default=None):
+        """Connect timeout for a profile, learned from its durations, or ``default``."""
+        samples = self.load().get("durations", {}).get(ssid)
+        if not samples:
+            return default
+        samples = sorted(samples)
+        slow = samples[(len(samples) * 9 + 9) // 10 - 1]
+        return min(max(slow * 3 // 2 + TIMEOUT_MARGIN_MS, MIN_TIMEOUT_MS), MAX_TIMEOUT_MS)
+
+    def last(self):
+        """Return (ssid, bssid, channel) of the last successful connection, or None."""
+        last = self.load().get("last")
+        if not last:
+            return None
+        ssid, bssid, channel = last
+        return ssid, unhexlify(bssid), channel
+
+    def set_last(self, ssid, bssid, channel):
+        last = [ssid, hexlify(bssid).decode(), channel]
+        data = self.load()
+        if data.get("last") != last:
+            data["last"] = last
+            self.dirty = True
+
+    def score(self, ssid, rssi):
+        """Rank a network by its signal strength, adjusted by its track record."""
+        counts = self.load()["profiles"].get(ssid)
+        if not counts:
+            return rssi
+        successes, failures = counts
+        return rssi + HISTORY_WEIGHT * (successes - failures) / (successes + failures)
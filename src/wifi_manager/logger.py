@@ -0,0 +1,65 @@
+from .network_utils import ticks_ms
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+class Logger:
+    """Leveled logger keeping the latest entries in a fixed-size ring buffer.
+
+    Messages take ``%`` arguments that are only formatted when the level is
+    enabled, so a disabled call costs a comparison. Entries are
+    ``(ticks_ms, level, message)`` tuples; ``echo`` also prints them.
+    """
+
+    __slots__ = ("level", "echo", "clock", "entries", "_next", "_count")
+
+    def __init__(self, level=INFO, size=32, echo=True, clock=ticks_ms):
+        self.level = level
+        self.echo = echo
+        self.clock = clock
+        self.entries = [None] * size
+        self._next = 0
+        self._count = 0
+
+    def log(self, level, message, *args):
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        self.entries[self._next] = (self.clock(), level, message)
+        self._next = (self._next + 1) % len(self.entries)
+        self._count = min(self._count + 1, len(self.entries))
+        if self.echo:
+            print(LEVEL_NAMES.get(level, level), message)
+
+    def debug(self, message, *args):
+        if self.level <= DEBUG:
+            self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        if self.level <= INFO:
+            self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        if self.level <= WARNING:
+            self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        if self.level <= ERROR:
+            self.log(ERROR, message, *args)
+
+    def records(self):
+        """The kept entries, oldest first."""
+        size = len(self.entries)
+        start = (self._next - self._count) % size
+        return [self.entries[(start + index) % size] for index in range(self._count)]
+
+    def clear(self):
+        for index in range(len(self.entries)):
+            self.entries[index] = None
+        self._next = 0
+        self._count = 0
@@ -1,11 +1,70 @@
+import gc
 import network
+import sys
 import time
-from wifi_manager.network_utils import read_credentials
-from wifi_manager.webserver import WebServer
+from wifi_manager.credentials import CredentialStore
+from wifi_manager.history import ConnectionHistory
+from wifi_manager.logger import DEBUG, INFO, Logger
+from wifi_manager.metrics import Metrics
+from wifi_manager.network_utils import ticks_ms, ticks_diff
+from wifi_manager.scan_cache import ScanCache
+
+CONNECT_POLL_MS = 100
+# STA power profiles: power-management mode, as a WLAN constant name, and TX power in dBm
+POWER_PROFILES = {
+    "performance": ("PM_NONE", 20),
+    "balanced": ("PM_PERFORMANCE", 15),
+    "low-power": ("PM_POWERSAVE", 8.5),
+}
+# Modules of the wifi_manager package only the portal uses
+_PORTAL_MODULES = ("webserver", "dns", "request", "response", "scheduler", "static")
+# Driver status codes that end a connection attempt, by failure cause
+_FAILURE_STATUSES = (
+    ("STAT_WRONG_PASSWORD", "wrong_password"),
+    ("STAT_NO_AP_FOUND", "no_ap_found"),
+    ("STAT_CONNECT_FAIL", "connect_fail"),
+)
 
 
 class WifiManager:
-    def __init__(self, ssid="WifiManager", password="wifimanager", reboot=True, debug=False):
+    __slots__ = (
+        "wlan_sta",
+        "wlan_ap",
+        "ap_ssid",
+        "ap_password",
+        "ap_authmode",
+        "credentials",
+        "reboot",
+        "logger",
+        "use_async",
+        "metrics",
+        "scan_cache",
+        "history",
+        "connect_timeout_ms",
+        "connect_deadline_ms",
+        "static_dir",
+        "power_profile",
+        "routes",
+        "last_failure",
+        "_connect_started",
+        "_connect_ms",
+        "_failure_causes",
+    )
+
+    def __init__(
+        self,
+        ssid="WifiManager",
+        password="wifimanager",
+        reboot=True,
+        debug=False,
+        use_async=False,
+        scan_ttl_ms=30000,
+        scan_max_entries=16,
+        connect_timeout_ms=10000,
+        connect_deadline_ms=30000,
+        static_dir=None,
+        power_profile=None,
+    ):
         self.wlan_sta = network.WLAN(network.STA_IF)
         self.wlan_sta.active(True)
         self.wlan_ap = network.WLAN(network.AP_IF)
@@ -20,23 +79,193 @@ class WifiManager:
             self.ap_password = password
 
         self.ap_authmode = 3
-        self.wifi_credentials = "wifi.dat"
+        self.credentials = CredentialStore("wifi.dat")
         self.wlan_sta.disconnect()
-        self.reboot: bool = reboot
-        self.debug: bool = debug
+        self.reboot = reboot
+        self.logger = Logger(DEBUG if debug else INFO)
+        self.use_async = use_async
+        self.metrics = Metrics()
+        self.scan_cache = ScanCache(
+            self.wlan_sta,
+            scan_ttl_ms,
+            scan_max_entries,
+            metrics=self.metrics,
+            keep=self.credentials.load,
+        )
+        self.history = ConnectionHistory("wifi_history.json")
+        self.connect_timeout_ms = connect_timeout_ms  # For networks without history
+        self.connect_deadline_ms = connect_deadline_ms  # For all the attempts of try_connect()
+        self.static_dir = static_dir  # Portal files on flash, served instead of built-in pages
+        if power_profile is not None and power_profile not in POWER_PROFILES:
+            raise ValueError("Unknown power profile: %s" % power_profile)
+        self.power_profile = power_profile  # None keeps the firmware default
+        self.routes = []  # Application pages for the portal, as route() arguments
+        self.last_failure = None
+        self._connect_started = 0
+        self._connect_ms = 0
+        self._failure_causes = {
+            getattr(network, name): cause
+            for name, cause in _FAILURE_STATUSES
+            if hasattr(network, name)
+        }
 
     def connect(self):
+        if self.try_connect():
+            return
+        self.logger.warning("No saved network connected, starting the configuration portal")
+        self.web_server()
+
+    def try_connect(self):
+        """Try the saved networks without starting the portal. Returns True if connected."""
         if self.wlan_sta.isconnected():
+            return True
+        profiles = self.credentials.load()
+        started = ticks_ms()
+        try:
+            for ssid, bssid, channel in self._attempts(profiles):
+                timeout_ms = self._attempt_timeout_ms(ssid, started)
+                if timeout_ms < CONNECT_POLL_MS:
+                    break
+                connected = self.wifi_connect(ssid, profiles[ssid], bssid, timeout_ms)
+                self._record_attempt(ssid, bssid, channel, connected, timeout_ms)
+                if connected:
+                    self.metrics.observe("time_to_connect_ms", ticks_diff(ticks_ms(), started))
+                    return True
+        finally:
+            self.history.save()
+        return False
+
+    async def try_connect_async(self):
+        """Same as try_connect(), yielding to the event loop while connecting."""
+        if self.wlan_sta.isconnected():
+            return True
+        profiles = self.credentials.load()
+        started = ticks_ms()
+        try:
+            for ssid, bssid, channel in self._attempts(profiles):
+                timeout_ms = self._attempt_timeout_ms(ssid, started)
+                if timeout_ms < CONNECT_POLL_MS:
+                    break
+                connected = await self.wifi_connect_async(ssid, profiles[ssid], bssid, timeout_ms)
+                self._record_attempt(ssid, bssid, channel, connected, timeout_ms)
+                if connected:
+                    self.metrics.observe("time_to_connect_ms", ticks_diff(ticks_ms(), started))
+                    return True
+        finally:
+            self.history.save()
+        return False
+
+    def _attempts(self, profiles):
+        """Yield (ssid, bssid, channel) to try, in order.
+
+        The access point used last time comes first and is tried without
+        scanning; the scan only runs if that attempt fails.
+        """
+        last = self.history.last()
+        if last is not None and last[0] in profiles:
+            yield last
+        yield from self._candidates(profiles)
+
+    def connect_timeout_for(self, ssid):
+        """Connect timeout for a network, learned from how long it took before."""
+        return self.history.timeout_ms(ssid, self.connect_timeout_ms)
+
+    def _attempt_timeout_ms(self, ssid, started):
+        """Timeout for the next attempt of try_connect(), within what is left of the deadline."""
+        timeout_ms = self.connect_timeout_for(ssid)
+        if self.connect_deadline_ms is None:
+            return timeout_ms
+        return min(timeout_ms, self.connect_deadline_ms - ticks_diff(ticks_ms(), started))
+
+    def _record_attempt(self, ssid, bssid, channel, connected, timeout_ms):
+        history = self.history
+        if connected:
+            history.record_success(ssid)
+            history.record_duration(ssid, self._connect_ms)
+            history.set_last(ssid, bssid, channel)
             return
-        profiles = read_credentials(self.wifi_credentials, self.debug)
-        for ssid, *_ in self.wlan_sta.scan():
+        history.record_failure(ssid)
+        if self.last_failure == "timeout" and timeout_ms >= self.connect_timeout_for(ssid):
+            # It may just be slow: waiting this long was not enough, so wait longer next time
+            history.record_duration(ssid, timeout_ms)
+
+    def _candidates(self, profiles):
+        """Return (ssid, bssid, channel) of the known networks in range, most promising first.
+
+        Each SSID appears once, on the access point with the strongest signal.
+        """
+        best = {}
+        for ssid, bssid, channel, rssi, *_ in self.scan_cache.results():
             ssid = ssid.decode("utf-8")
-            if ssid in profiles:
-                password = profiles[ssid]
-                if self.wifi_connect(ssid, password):
-                    return
-        print("Could not connect to any WiFi network. Starting the configuration portal...")
-        self.web_server()
+            if ssid in profiles and (ssid not in best or rssi > best[ssid][2]):
+                best[ssid] = (bssid, channel, rssi)
+        history = self.history
+        ranked = sorted(
+            best.items(), key=lambda item: history.score(item[0], item[1][2]), reverse=True
+        )
+        return [(ssid, bssid, channel) for ssid, (bssid, channel, _) in ranked]
+
+    def set_power_profile(self, name):
+        """Switch to a named power profile, applying it at once if connected."""
+        if name not in POWER_PROFILES:
+            raise ValueError("Unknown power profile: %s" % name)
+        self.power_profile = name
+        if self.wlan_sta.isconnected():
+            self._apply_power_profile()
+
+    def _apply_power_profile(self):
+        if self.power_profile is None:
+            return
+        pm, txpower = POWER_PROFILES[self.power_profile]
+        self._configure_power((("pm", getattr(self.wlan_sta, pm, None)), ("txpower", txpower)))
+        self.logger.info("Power profile: %s", self.power_profile)
+
+    def _configure_power(self, settings):
+        # Ports differ in what they support; apply each setting on its own
+        for setting, value in settings:
+            if value is None:
+                self.logger.warning("Power setting not supported: %s", setting)
+                continue
+            try:
+                self.wlan_sta.config(**{setting: value})
+            except (OSError, TypeError, ValueError) as error:
+                self.logger.warning("Power setting not supported: %s (%r)", setting, error)
+
+    def _power_settings(self):
+        """The (setting, value) pairs in effect, for those the port can report."""
+        settings = []
+        for setting in ("pm", "txpower"):
+            try:
+                settings.append((setting, self.wlan_sta.config(setting)))
+            except (OSError, TypeError, ValueError):
+                pass
+        return settings
+
+    def benchmark_power_profiles(self, profiles=None, count=10, port=80):
+        """Measure the round trip to the gateway under each power profile.
+
+        Returns ``{profile: ping stats}`` and records the average in the
+        ``rtt_ms`` histogram. The radio's power settings are read first and
+        restored afterwards, firmware defaults included.
+        """
+        from wifi_manager.ping import ping
+
+        current = self.power_profile
+        saved = self._power_settings()
+        gateway = self.wlan_sta.ifconfig()[2]
+        results = {}
+        try:
+            for name in profiles or POWER_PROFILES:
+                self.set_power_profile(name)
+                stats = ping(gateway, port, count)
+                if stats["avg_ms"] is not None:
+                    self.metrics.observe("rtt_ms", stats["avg_ms"], name)
+                self.logger.info("Round trip with %s: %s", name, stats)
+                results[name] = stats
+        finally:
+            self.power_profile = current
+            self._configure_power(saved)
+        return results
 
     def disconnect(self):
         if self.wlan_sta.isconnected():
@@ -48,20 +277,89 @@ class WifiManager:
     def get_address(self):
         return self.wlan_sta.ifconfig()
 
-    def wifi_connect(self, ssid, password):
-        print("Trying to connect to:", ssid)
-        self.wlan_sta.connect(ssid, password)
-        for _ in range(100):
-            if self.wlan_sta.isconnected():
-                print("\nConnected! Network information:", self.wlan_sta.ifconfig())
-                return True
-            else:
-                print(".", end="")
-                time.sleep_ms(100)
-        print("\nConnection failed!")
+    def _start_connect(self, ssid, password, bssid):
+        self.logger.info("Connecting to %s", ssid)
+        self.metrics.inc("connect_attempts")
+        self._connect_started = ticks_ms()
+        if bssid is None:
+            self.wlan_sta.connect(ssid, password)
+        else:
+            self.wlan_sta.connect(ssid, password, bssid=bssid)
+
+    def _poll_connect(self):
+        """Return True once connected, a failure cause once the driver gives up, else None."""
+        if self.wlan_sta.isconnected():
+            self._connect_ms = ticks_diff(ticks_ms(), self._connect_started)
+            self.logger.info("Connected in %d ms: %s", self._connect_ms, self.wlan_sta.ifconfig())
+            self._apply_power_profile()
+            self.metrics.inc("connect_successes")
+            self.metrics.observe("connect_ms", self._connect_ms)
+            return True
+        return self._failure_causes.get(self.wlan_sta.status())
+
+    def _connect_failed(self, cause):
+        self.logger.warning("Connection failed: %s", cause)
+        self.metrics.inc("connect_failures", cause)
+        self.last_failure = cause
         self.wlan_sta.disconnect()
         return False
 
+    def wifi_connect(self, ssid, password, bssid=None, timeout_ms=None):
+        """Connect to a network, returning early if the driver reports a failure."""
+        self._start_connect(ssid, password, bssid)
+        timeout_ms = self.connect_timeout_for(ssid) if timeout_ms is None else timeout_ms
+        for _ in range(timeout_ms // CONNECT_POLL_MS):
+            result = self._poll_connect()
+            if result is True:
+                return True
+            if result:
+                return self._connect_failed(result)
+            time.sleep_ms(CONNECT_POLL_MS)
+        return self._connect_failed("timeout")
+
+    async def wifi_connect_async(self, ssid, password, bssid=None, timeout_ms=None):
+        """Same as wifi_connect(), yielding to the event loop while waiting."""
+        try:
+            import asyncio
+        except ImportError:
+            import uasyncio as asyncio
+
+        self._start_connect(ssid, password, bssid)
+        timeout_ms = self.connect_timeout_for(ssid) if timeout_ms is None else timeout_ms
+        for _ in range(timeout_ms // CONNECT_POLL_MS):
+            result = self._poll_connect()
+            if result is True:
+                return True
+            if result:
+                return self._connect_failed(result)
+            await asyncio.sleep(CONNECT_POLL_MS / 1000)
+        return self._connect_failed("timeout")
+
+    def route(self, path, handler, methods=("GET",)):
+        """Add a page to the portal, as ``WebServer.route()`` does, once it starts."""
+        self.routes.append((path, handler, methods))
+
     def web_server(self):
-        server = WebServer(self)
-        server.run()
+        # Imported on demand: a boot that joins a saved network never loads the portal
+        from wifi_manager.webserver import WebServer
+
+        server = WebServer(self, static_dir=self.static_dir)
+        for path, handler, methods in self.routes:
+            server.route(path, handler, methods)
+        if self.use_async:
+            server.run_async()
+        else:
+            server.run()
+        # Without a reboot the application carries on with the STA up: give it the portal's RAM
+        del server, WebServer
+        _unload_portal()
+
+
+def _unload_portal():
+    """Drop the portal modules so their code and buffers can be garbage collected."""
+    package = sys.modules.get("wifi_manager")
+    for name in _PORTAL_MODULES:
+        sys.modules.pop("wifi_manager." + name, None)
+        if package is not None and hasattr(package, name):
+            delattr(package, name)
+    gc.collect()
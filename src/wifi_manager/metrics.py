@@ -0,0 +1,81 @@
+import gc
+import json
+
+# Upper bounds, in ms, of the timing histogram buckets; the last bucket is unbounded
+BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket timing histogram; observing a value does not allocate."""
+
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "max": self.max, "buckets": self.buckets}
+
+
+class Metrics:
+    """Counters and timing histograms, optionally broken down by a label.
+
+    Callers pass names and labels that already exist (constants, route
+    paths, failure causes), so recording a sample builds no strings.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, label=None, value=1):
+        counters = self.counters
+        if label is None:
+            counters[name] = counters.get(name, 0) + value
+            return
+        labels = counters.get(name)
+        if labels is None:
+            labels = counters[name] = {}
+        labels[label] = labels.get(label, 0) + value
+
+    def observe(self, name, value, label=None):
+        histograms = self.histograms
+        if label is not None:
+            histograms = histograms.get(name)
+            if histograms is None:
+                histograms = self.histograms[name] = {}
+            name = label
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def snapshot(self):
+        histograms = {}
+        for name, histogram in self.histograms.items():
+            if isinstance(histogram, dict):
+                histograms[name] = {label: h.to_dict() for label, h in histogram.items()}
+            else:
+                histograms[name] = histogram.to_dict()
+        snapshot = {"counters": self.counters, "histograms": histograms}
+        if hasattr(gc, "mem_free"):
+            snapshot["mem_free"] = gc.mem_free()
+            snapshot["mem_alloc"] = gc.mem_alloc()
+        return snapshot
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), separators=(",", ":"))
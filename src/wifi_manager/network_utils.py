@@ -1,24 +1,43 @@
+from .credentials import CredentialStore
+
+try:
+    from time import ticks_ms, ticks_us, ticks_add, ticks_diff
+except ImportError:  # CPython
+    from time import monotonic
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_us():
+        return int(monotonic() * 1000000)
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(end, start):
+        return end - start
+
+
 def write_credentials(wifi_credentials, profiles):
-    lines = []
-    for ssid, password in profiles.items():
-        lines.append("{0};{1}\n".format(ssid, password))
-    with open(wifi_credentials, "w") as file:
-        file.write("".join(lines))
+    CredentialStore(wifi_credentials).replace(profiles)
 
 
-def read_credentials(wifi_credentials, debug=False):
-    lines = []
+def read_credentials(wifi_credentials, debug=False, logger=None):
+    """Load the saved profiles, or return {} on error, reported to ``logger``.
+
+    ``debug`` is kept for compatibility: without a logger, it reports the
+    error on the console as before.
+    """
     try:
-        with open(wifi_credentials) as file:
-            lines = file.readlines()
+        return CredentialStore(wifi_credentials).load()
     except Exception as error:
-        if debug:
-            print(error)
-    profiles = {}
-    for line in lines:
-        ssid, password = line.strip().split(";")
-        profiles[ssid] = password
-    return profiles
+        if logger is None and debug:
+            from .logger import Logger
+
+            logger = Logger()
+        if logger is not None:
+            logger.warning("Could not read credentials: %r", error)
+        return {}
 
 
 def url_decode(data):
@@ -38,3 +57,39 @@ def url_decode(data):
         result.append(data[i])
         i += 1
     return bytes(result)
+
+
+_HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+
+def _unquote_plus(data):
+    if b"+" in data:
+        data = data.replace(b"+", b" ")
+    if b"%" not in data:
+        return data.decode("utf-8")
+    parts = data.split(b"%")
+    result = bytearray(parts[0])
+    for part in parts[1:]:
+        if len(part) >= 2 and part[0] in _HEX_DIGITS and part[1] in _HEX_DIGITS:
+            result.append(int(part[:2], 16))
+            result.extend(part[2:])
+        else:
+            # Not an escape, keep the percent sign as is
+            result.append(0x25)
+            result.extend(part)
+    return bytes(result).decode("utf-8")
+
+
+def parse_form(data):
+    """Parse an application/x-www-form-urlencoded body into a dict of str.
+
+    Raises ValueError if a field is not valid UTF-8 once decoded.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    form = {}
+    for field in data.split(b"&"):
+        if field:
+            name, _, value = field.partition(b"=")
+            form[_unquote_plus(name)] = _unquote_plus(value)
+    return form
@@ -0,0 +1,43 @@
+import errno
+import socket
+import time
+
+from .network_utils import ticks_us, ticks_diff
+
+# A closed port answers the SYN with a reset: lwIP reports it as a reset or an abort
+_ANSWERED = (errno.ECONNREFUSED, errno.ECONNRESET, errno.ECONNABORTED)
+
+
+def ping(host, port=80, count=10, interval_ms=200, timeout_ms=1000):
+    """Measure round trips to ``host`` by timing TCP connection setups.
+
+    Raw ICMP sockets are not available on MicroPython, but a TCP handshake
+    costs one round trip whether the port accepts the connection or resets
+    it. Probes are spaced by ``interval_ms`` so a power-saving radio goes
+    back to sleep in between. Returns a dict with the min/avg/max round trip
+    in ms and the number of probes lost.
+    """
+    address = socket.getaddrinfo(host, port)[0][-1]
+    samples = []
+    for index in range(count):
+        if index:
+            time.sleep_ms(interval_ms)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout_ms / 1000)
+        started = ticks_us()
+        try:
+            sock.connect(address)
+        except OSError as error:
+            if not error.args or error.args[0] not in _ANSWERED:
+                sock.close()
+                continue  # Lost
+        samples.append(ticks_diff(ticks_us(), started) / 1000)
+        sock.close()
+    if not samples:
+        return {"min_ms": None, "avg_ms": None, "max_ms": None, "lost": count}
+    return {
+        "min_ms": min(samples),
+        "avg_ms": sum(samples) / len(samples),
+        "max_ms": max(samples),
+        "lost": count - len(samples),
+    }
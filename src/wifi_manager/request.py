@@ -0,0 +1,128 @@
+_HEAD_END = b"\r\n\r\n"
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with the HTTP status to reply with."""
+
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    __slots__ = ("method", "path", "query", "version", "headers", "body")
+
+    def __init__(self, method, path, query, version, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.version = version
+        self.headers = headers  # Lower-case names
+        self.body = body
+
+
+class RequestParser:
+    """Incremental HTTP/1.x request parser working in one preallocated buffer.
+
+    Data is either received straight into ``free()`` and committed with
+    ``advance()``, or copied in with ``feed()``. Both return the parsed
+    ``Request`` once the headers and ``Content-Length`` bytes of body are
+    complete, and None while more data is needed.
+    """
+
+    __slots__ = (
+        "max_header",
+        "max_body",
+        "buffer",
+        "view",
+        "length",
+        "_scanned",
+        "_body_start",
+        "_body_end",
+        "_head",
+    )
+
+    def __init__(self, max_header=1024, max_body=512):
+        self.max_header = max_header
+        self.max_body = max_body
+        self.buffer = bytearray(max_header + max_body)
+        self.view = memoryview(self.buffer)
+        self.reset()
+
+    def reset(self):
+        self.length = 0
+        self._scanned = 0
+        self._body_start = -1
+        self._body_end = 0
+        self._head = None
+
+    def consume(self):
+        """Forget the request just parsed, keeping any bytes received after it."""
+        end = self._body_end
+        leftover = self.length - end
+        if leftover > 0:
+            self.buffer[:leftover] = self.buffer[end : self.length]
+        self.reset()
+        self.length = max(leftover, 0)
+
+    def free(self):
+        """Writable view of the unused part of the buffer."""
+        return self.view[self.length :]
+
+    def feed(self, data):
+        size = len(data)
+        if size > len(self.buffer) - self.length:
+            raise RequestError(413 if self._body_start >= 0 else 431)
+        self.view[self.length : self.length + size] = data
+        return self.advance(size)
+
+    def advance(self, size):
+        self.length += size
+        if self._body_start < 0:
+            # Only the new bytes, plus a possibly split terminator, are searched
+            start = max(0, self._scanned - 3)
+            end = bytes(self.view[start : self.length]).find(_HEAD_END)
+            self._scanned = self.length
+            if end < 0:
+                if self.length >= self.max_header:
+                    raise RequestError(431)
+                return None
+            # A head that came in with a single read may already be past the limit
+            if start + end > self.max_header:
+                raise RequestError(431)
+            self._body_start = start + end + 4
+            self._head = self._parse_head(bytes(self.view[: start + end]))
+            try:
+                content_length = int(self._head[4].get("content-length", "0"))
+            except ValueError:
+                raise RequestError(400)
+            if content_length < 0:
+                raise RequestError(400)
+            if content_length > self.max_body:
+                raise RequestError(413)
+            self._body_end = self._body_start + content_length
+        if self.length < self._body_end:
+            return None
+        method, path, query, version, headers = self._head
+        body = bytes(self.view[self._body_start : self._body_end])
+        return Request(method, path, query, version, headers, body)
+
+    @staticmethod
+    def _parse_head(head):
+        try:
+            lines = head.decode("utf-8").split("\r\n")
+        except UnicodeError:
+            raise RequestError(400)
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[1].startswith("/"):
+            raise RequestError(400)
+        method, target, version = parts
+        path, _, query = target.partition("?")
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if separator:
+                headers[name.strip().lower()] = value.strip()
+        return method, path, query, version, headers
@@ -0,0 +1,47 @@
+class ResponseWriter:
+    """Streams a response through one preallocated buffer.
+
+    Writes are copied into the buffer and only sent when it is full or on
+    ``flush()``, so a small page costs a single ``sendall`` and no
+    intermediate strings are built.
+    """
+
+    __slots__ = ("buffer", "view", "length", "client")
+
+    def __init__(self, size=512):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.client = None
+
+    def begin(self, client):
+        self.client = client
+        self.length = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        size = len(data)
+        if self.length + size > len(self.buffer):
+            self.flush()
+            if size > len(self.buffer):
+                self.client.sendall(data)
+                return
+        self.view[self.length : self.length + size] = data
+        self.length += size
+
+    def flush(self):
+        if self.length:
+            self.client.sendall(self.view[: self.length])
+            self.length = 0
+
+    def write_file(self, file):
+        """Copy a binary file to the client, reading each chunk straight into the buffer."""
+        buffer_size = len(self.buffer)
+        while True:
+            if self.length == buffer_size:
+                self.flush()
+            size = file.readinto(self.view[self.length :])
+            if not size:
+                return
+            self.length += size
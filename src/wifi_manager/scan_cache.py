@@ -0,0 +1,57 @@
+from .network_utils import ticks_ms, ticks_diff
+
+
+class ScanCache:
+    """Keeps the result of the last WiFi scan for a limited time.
+
+    A scan blocks the radio for a few seconds, so ``connect()`` and the captive
+    portal share the same results and only rescan once they are stale. Only
+    the strongest access point of each SSID is kept, and ``keep()`` returns
+    the SSIDs kept beyond ``max_entries``, so a saved network is never lost
+    among stronger ones.
+    """
+
+    def __init__(self, wlan, ttl_ms=30000, max_entries=16, clock=ticks_ms, metrics=None, keep=None):
+        self.wlan = wlan
+        self.metrics = metrics
+        self.keep = keep
+        self.ttl_ms = ttl_ms
+        self.max_entries = max_entries
+        self.clock = clock
+        self._results = None
+        self._scanned_at = 0
+
+    def is_stale(self):
+        if self._results is None:
+            return True
+        return ticks_diff(self.clock(), self._scanned_at) >= self.ttl_ms
+
+    def refresh(self):
+        """Scan now and keep the strongest networks."""
+        started = self.clock()
+        results = self.wlan.scan()
+        self._scanned_at = self.clock()
+        if self.metrics is not None:
+            self.metrics.observe("scan_ms", ticks_diff(self._scanned_at, started))
+        # Scan tuples are (ssid, bssid, channel, RSSI, security, hidden)
+        results.sort(key=lambda network: network[3], reverse=True)
+        known = {ssid.encode("utf-8") for ssid in self.keep()} if self.keep else ()
+        kept = []
+        seen = set()
+        for network in results:
+            if network[0] in seen:
+                continue  # A weaker access point of a network already kept
+            seen.add(network[0])
+            if len(kept) < self.max_entries or network[0] in known:
+                kept.append(network)
+        self._results = kept
+        return kept
+
+    def results(self, refresh=False):
+        """Return the cached scan results, scanning first if they are stale."""
+        if refresh or self.is_stale():
+            return self.refresh()
+        return self._results
+
+    def invalidate(self):
+        self._results = None
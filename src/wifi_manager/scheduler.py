@@ -0,0 +1,54 @@
+import heapq
+
+from .network_utils import ticks_ms, ticks_diff
+
+
+class Scheduler:
+    """Deferred actions, kept in a heap ordered by deadline.
+
+    The server loop calls ``run_due()`` and waits at most ``next_delay_ms()``
+    between calls, so delayed work never blocks the portal. Deadlines are in
+    milliseconds since the first reading of the clock: ticks wrap around, so
+    they cannot order the heap themselves.
+    """
+
+    def __init__(self, clock=ticks_ms):
+        self.clock = clock
+        self._queue = []
+        self._sequence = 0  # Keeps the order of actions with the same deadline
+        self._ticks = None  # Last clock reading
+        self._elapsed = 0  # Milliseconds up to it
+
+    def _now(self):
+        ticks = self.clock()
+        if self._ticks is not None:
+            self._elapsed += ticks_diff(ticks, self._ticks)
+        self._ticks = ticks
+        return self._elapsed
+
+    def call_later(self, delay_ms, callback, *args):
+        """Run ``callback(*args)`` in ``delay_ms``. Returns a handle for ``cancel()``."""
+        self._sequence += 1
+        entry = [self._now() + delay_ms, self._sequence, callback, args]
+        heapq.heappush(self._queue, entry)
+        return entry
+
+    def cancel(self, entry):
+        entry[2] = None  # Dropped when it reaches the top of the heap
+
+    def pending(self):
+        return len(self._queue)
+
+    def next_delay_ms(self):
+        """Milliseconds until the next action is due, or None if there is none."""
+        if not self._queue:
+            return None
+        return max(0, self._queue[0][0] - self._now())
+
+    def run_due(self):
+        """Run the actions that are due, in deadline order."""
+        queue = self._queue
+        while queue and queue[0][0] <= self._now():
+            _, _, callback, args = heapq.heappop(queue)
+            if callback is not None:
+                callback(*args)
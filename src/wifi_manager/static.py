@@ -0,0 +1,64 @@
+import os
+
+# By file extension; anything else is sent as application/octet-stream
+CONTENT_TYPES = {
+    "html": "text/html",
+    "css": "text/css",
+    "js": "application/javascript",
+    "json": "application/json",
+    "svg": "image/svg+xml",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "ico": "image/x-icon",
+    "txt": "text/plain",
+}
+_DIRECTORY = 0x4000
+
+
+class StaticFiles:
+    """Files served from a directory on flash, preferring precompressed ``.gz`` copies.
+
+    ``find()`` only stats the file; the response is streamed from it by the
+    caller, so a file of any size costs the same amount of RAM.
+    """
+
+    def __init__(self, root, max_age=86400):
+        self.root = root.rstrip("/")
+        self.max_age = max_age
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return None if stat[0] & _DIRECTORY else stat
+
+    def find(self, path, gzip=False):
+        """Return (file path, size, etag, headers) for a request path, or None.
+
+        ``headers`` holds the content type, caching and encoding lines.
+        """
+        if ".." in path or not path.startswith("/"):
+            return None
+        if path.endswith("/"):
+            path += "index.html"
+        full_path = self.root + path
+        stat = self._stat(full_path + ".gz") if gzip else None
+        encoding = ""
+        if stat is not None:
+            full_path += ".gz"
+            encoding = "Content-Encoding: gzip\r\n"
+        else:
+            stat = self._stat(full_path)
+            if stat is None:
+                return None
+        size = stat[6]
+        etag = '"%x-%x%s"' % (size, stat[8], "-gz" if encoding else "")
+        content_type = CONTENT_TYPES.get(path.rpartition(".")[2], "application/octet-stream")
+        headers = "Content-Type: %s\r\n%sVary: Accept-Encoding\r\nCache-Control: max-age=%d\r\n" % (
+            content_type,
+            encoding,
+            self.max_age,
+        )
+        headers = (headers + "ETag: %s\r\n" % etag).encode()
+        return full_path, size, etag, headers
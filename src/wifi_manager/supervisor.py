@@ -0,0 +1,79 @@
+import random
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class ConnectionSupervisor:
+    """Watches the STA link and reconnects with exponential backoff and jitter.
+
+    Reconnection goes through ``WifiManager.try_connect()``, so it uses the
+    same saved profiles and ordering as ``connect()`` but never starts the
+    portal. Either await ``run()`` as an asyncio task or call ``poll()``
+    periodically and wait the number of milliseconds it returns.
+    """
+
+    def __init__(
+        self,
+        manager,
+        on_connect=None,
+        on_disconnect=None,
+        interval_ms=1000,
+        backoff_min_ms=2000,
+        backoff_max_ms=300000,
+    ):
+        self.manager = manager
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.interval_ms = interval_ms
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.connected = manager.is_connected()
+        self.failures = 0
+        self._running = False
+
+    def backoff_ms(self):
+        """Delay before the next attempt: exponential in the failures, jittered by up to half."""
+        delay = min(self.backoff_max_ms, self.backoff_min_ms << min(self.failures - 1, 16))
+        half = delay // 2
+        return half + half * random.getrandbits(16) // 65536
+
+    def _set_connected(self, connected):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        callback = self.on_connect if connected else self.on_disconnect
+        if callback is not None:
+            callback()
+
+    def _after_attempt(self, connected):
+        self._set_connected(connected)
+        if connected:
+            self.failures = 0
+            return self.interval_ms
+        self.failures += 1
+        return self.backoff_ms()
+
+    def poll(self):
+        """Check the link once, reconnecting if needed. Returns ms until the next poll."""
+        if self.manager.is_connected():
+            return self._after_attempt(True)
+        self._set_connected(False)
+        return self._after_attempt(self.manager.try_connect())
+
+    async def poll_async(self):
+        if self.manager.is_connected():
+            return self._after_attempt(True)
+        self._set_connected(False)
+        return self._after_attempt(await self.manager.try_connect_async())
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            delay_ms = await self.poll_async()
+            await asyncio.sleep(delay_ms / 1000)
+
+    def stop(self):
+        self._running = False
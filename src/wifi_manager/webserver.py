@@ -1,185 +1,635 @@
-import re
+import json
+import select
 import socket
-import time
 import machine
-from .network_utils import url_decode, read_credentials, write_credentials
+from binascii import crc32
+from .dns import DNSServer
+from .logger import DEBUG, LEVEL_NAMES
+from .network_utils import parse_form, ticks_ms, ticks_diff
+from .request import RequestError, RequestParser
+from .response import ResponseWriter
+from .scheduler import Scheduler
+from .static import StaticFiles
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+_STATUS_LINES = {
+    200: b"HTTP/1.1 200 OK\r\n",
+    304: b"HTTP/1.1 304 Not Modified\r\n",
+    400: b"HTTP/1.1 400 Bad Request\r\n",
+    404: b"HTTP/1.1 404 Not Found\r\n",
+    405: b"HTTP/1.1 405 Method Not Allowed\r\n",
+    413: b"HTTP/1.1 413 Content Too Large\r\n",
+    431: b"HTTP/1.1 431 Request Header Fields Too Large\r\n",
+    503: b"HTTP/1.1 503 Service Unavailable\r\n",
+}
+_HTML_HEADERS = b"Content-Type: text/html\r\n"
+_JSON_HEADERS = b"Content-Type: application/json\r\n"
+_CONTENT_LENGTH = b"Content-Length: "
+_CRLF = b"\r\n"
+_ALLOW = b"Allow: "
+_KEEP_ALIVE = b"Connection: keep-alive\r\n\r\n"
+_CLOSE = b"Connection: close\r\n\r\n"
+_PAGE_HEAD = (
+    b'<!DOCTYPE html><html lang="en"><head><title>WiFi Manager</title>'
+    b'<meta charset="UTF-8">'
+    b'<meta name="viewport" content="width=device-width, initial-scale=1">'
+    b'<link rel="icon" href="data:,"></head><body>'
+)
+_PAGE_TAIL = b"</body></html>"
+_RETRY_LATER_PAGE = b"<p>Please wait a few seconds!</p><p>Go back and try again!</p>"
+_MISSING_FIELDS_PAGE = b"<p>Parameters not found!</p>"
+_MISSING_SSID_PAGE = b"<p>SSID must be provided!</p><p>Go back and try again!</p>"
+_BAD_REQUEST_PAGE = b"<p>Bad request!</p>"
+_NOT_FOUND_PAGE = b"<p>Page not found!</p>"
+_METHOD_NOT_ALLOWED_PAGE = b"<p>Method not allowed!</p>"
+_RETRY_LATER_JSON = b'{"connected":false,"error":"retry_later"}'
+_INVALID_PARAMETERS_JSON = b'{"connected":false,"error":"invalid_parameters"}'
+# The portal page is static; the browser fills in the networks from /api/networks.
+_ROOT_PAGE = (
+    _PAGE_HEAD
+    + b'<h1>WiFi Manager</h1><form action="/configure" method="post" accept-charset="utf-8">'
+    b'<div id="networks"><noscript><p><label for="ssid">SSID:&nbsp;</label>'
+    b'<input id="ssid" name="ssid"></p></noscript></div>'
+    b'<p><label for="password">Password:&nbsp;</label>'
+    b'<input type="password" id="password" name="password"></p>'
+    b'<p><input type="submit" value="Connect"></p></form>'
+    b"<script>"
+    b'fetch("/api/networks").then(r=>r.json()).then(n=>{'
+    b'const d=document.getElementById("networks");d.textContent="";'
+    b"n.forEach(([s,r])=>{"
+    b'const p=document.createElement("p"),i=document.createElement("input"),'
+    b'l=document.createElement("label");'
+    b'i.type="radio";i.name="ssid";i.value=i.id=s;l.htmlFor=s;'
+    b'l.textContent="\\u00a0"+s+" ("+r+" dBm)";p.append(i,l);d.append(p)})})'
+    b"</script>" + _PAGE_TAIL
+)
+_ROOT_ETAG = '"%08x"' % crc32(_ROOT_PAGE)
+_ROOT_CACHE_HEADERS = "Cache-Control: no-cache\r\nETag: %s\r\n" % _ROOT_ETAG
+_ROOT_HEADERS = (
+    "Content-Type: text/html\r\nContent-Length: %d\r\n%s" % (len(_ROOT_PAGE), _ROOT_CACHE_HEADERS)
+).encode()
+_NOT_MODIFIED_HEADERS = _ROOT_CACHE_HEADERS.encode()
+
+
+def _handed_off():
+    pass
+
+
+class _StreamClient:
+    """Socket-like adapter so the request handlers can write to an asyncio stream."""
+
+    __slots__ = ("writer",)
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def send(self, data):
+        self.writer.write(data)
+        return len(data)
+
+    def sendall(self, data):
+        # The response buffer is reused, so the stream must keep its own copy.
+        self.writer.write(bytes(data))
+
+    def close(self):
+        # The stream is drained and closed by _handle_client_async.
+        pass
 
 
 class WebServer:
-    def __init__(self, manager, sleep_fn=time.sleep, reset_fn=machine.reset, debug=False):
-        self.manager = manager
-        self.wlan_ap = manager.wlan_ap
-        self.wlan_sta = manager.wlan_sta
-        self.ap_ssid = manager.ap_ssid
-        self.ap_password = manager.ap_password
-        self.ap_authmode = manager.ap_authmode
-        self.reboot = manager.reboot
-        self.debug = debug
-        self.wifi_credentials = manager.wifi_credentials
-        self.sleep_fn = sleep_fn  # Dependency injection for time.sleep
+    __slots__ = (
+        "manager",
+        "reset_fn",
+        "scheduler",
+        "reboot_delay_ms",
+        "handoff_delay_ms",
+        "configure_cooldown_ms",
+        "configure_locked",
+        "_connecting",
+        "_reboot",
+        "client_timeout",
+        "idle_timeout",
+        "max_requests",
+        "keep_alive",
+        "blocking_keep_alive",
+        "sta_poll_interval",
+        "captive_dns",
+        "dns_port",
+        "writer",
+        "parser",
+        "_parsers",
+        "routes",
+        "static",
+    )
+
+    def __init__(self, manager, reset_fn=machine.reset, debug=False, static_dir=None):
+        self.manager = manager  # Radio, scan cache, credentials and metrics are shared with it
+        if debug:
+            manager.logger.level = DEBUG
         self.reset_fn = reset_fn  # Dependency injection for machine.reset
+        self.scheduler = Scheduler()
+        self.reboot_delay_ms = 5000
+        self.handoff_delay_ms = 1000  # Without reboot, before the access point goes down
+        self.configure_cooldown_ms = 5000  # After a failed attempt
+        self.configure_locked = False
+        self._connecting = False  # A configure request is waiting for the STA on the event loop
+        self._reboot = None
+        self.client_timeout = 5.0
+        self.idle_timeout = 1.0  # Wait for the next request on a kept-alive connection
+        self.max_requests = 10  # Per connection
+        self.keep_alive = False  # Whether the current response keeps the connection open
+        # run() serves one client at a time: an idle kept-alive one would hold off the others
+        # and the DNS responder, so only serve() keeps connections open by default
+        self.blocking_keep_alive = False
+        self.sta_poll_interval = 0.5
+        self.captive_dns = True
+        self.dns_port = 53
+        self.writer = ResponseWriter()
+        self.parser = RequestParser()
+        self._parsers = []  # Spare parsers for concurrent asyncio clients
+        self.routes = _ROUTES  # Shared until route() adds to it
+        self.static = StaticFiles(static_dir) if static_dir else None
 
     def _reboot_device(self):
-        """Reboot the device after a delay."""
-        if self.reboot:
-            print("The device will reboot in 5 seconds.")
-            self.sleep_fn(5)
-            self.reset_fn()
+        """Schedule a reboot, leaving the portal running until then."""
+        if self.manager.reboot and self._reboot is None:
+            self.manager.logger.info("Rebooting in %d ms", self.reboot_delay_ms)
+            self._reboot = self.scheduler.call_later(self.reboot_delay_ms, self.reset_fn)
+
+    def _done(self):
+        """Whether the portal can stop: the STA is connected and no action is pending."""
+        if self._connecting or not self.manager.wlan_sta.isconnected():
+            return False
+        self._reboot_device()
+        return not self.scheduler.pending()
+
+    def _poll_timeout_ms(self):
+        timeout = int(self.sta_poll_interval * 1000)
+        delay = self.scheduler.next_delay_ms()
+        return timeout if delay is None else min(timeout, delay)
 
-    def _create_server_socket(self):
+    def _create_server_socket(self, host="", port=80, backlog=1):
         """Create and configure the server socket."""
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind(("", 80))
-        server_socket.listen(1)
+        server_socket.bind((host, port))
+        server_socket.listen(backlog)
         return server_socket
 
-    def _parse_request(self, request):
-        """Parse the HTTP request and extract the URL."""
-        try:
-            url = (
-                re.search(b"(?:GET|POST) /(.*?)(?:\\?.*?)? HTTP", request)
-                .group(1)
-                .decode("utf-8")
-                .rstrip("/")
-            )
-            return url
-        except Exception as error:
-            if self.debug:
-                print(f"Error parsing request: {error}")
+    def _create_dns_server(self, host=""):
+        """Start the captive-portal DNS responder, pointing every name to the AP."""
+        if not self.captive_dns:
             return None
+        dns = DNSServer(self.manager.wlan_ap.ifconfig()[0], self.dns_port)
+        dns.open(host)
+        return dns
+
+    def _read_request(self, client, idle=False):
+        """Receive a complete request straight into the parser buffer.
+
+        Returns None if the peer closes or, when ``idle``, stops sending
+        between requests.
+        """
+        parser = self.parser
+        # Bytes of a pipelined request may already be buffered
+        request = parser.advance(0) if parser.length else None
+        # CPython sockets only provide recv_into
+        readinto = getattr(client, "readinto", None) or client.recv_into
+        while request is None:
+            buffer = parser.free()
+            if not len(buffer):
+                raise RequestError(413)
+            try:
+                size = readinto(buffer)
+            except OSError:
+                if idle and not parser.length:
+                    return None
+                raise
+            if not size:
+                if not parser.length:
+                    return None
+                raise RequestError(400)
+            request = parser.advance(size)
+        return request
+
+    @staticmethod
+    def _wants_keep_alive(request):
+        if request.version != "HTTP/1.1":
+            return False
+        return request.headers.get("connection", "").lower() != "close"
 
     def _handle_client(self, client):
-        """Handle a single client connection."""
+        """Handle a client connection, serving requests until it closes."""
         try:
-            client.settimeout(5.0)
-            request = b""
-            while True:
-                chunk = client.recv(128)
-                if not chunk:
-                    break
-                request += chunk
-                if b"\r\n\r\n" in request:
-                    break
+            client.settimeout(self.client_timeout)
+            self.parser.reset()
+            for count in range(1, self.max_requests + 1):
+                try:
+                    request = self._read_request(client, idle=count > 1)
+                except RequestError as error:
+                    self.keep_alive = False
+                    self.handle_error(client, error.status_code)
+                    return
+                if request is None:
+                    return
+                self.keep_alive = (
+                    self.blocking_keep_alive
+                    and count < self.max_requests
+                    and self._wants_keep_alive(request)
+                )
+                self._dispatch(client, request)
+                if not self.keep_alive:
+                    return
+                self.parser.consume()
+                client.settimeout(self.idle_timeout)
+        except Exception as error:
+            self.manager.logger.debug("Error handling client: %r", error)
+        finally:
+            client.close()
+
+    def route(self, path, handler, methods=("GET",)):
+        """Serve ``path`` with ``handler(server, client, request)`` for the given methods.
+
+        Replaces the handler already registered for the same path and method,
+        so built-in pages can be overridden too.
+        """
+        if self.routes is _ROUTES:
+            self.routes = {path: dict(handlers) for path, handlers in _ROUTES.items()}
+        handlers = self.routes.setdefault(path.rstrip("/") or "/", {})
+        for method in methods:
+            handlers[method] = handler
+
+    def _dispatch(self, client, request):
+        """Route a parsed request to its handler.
 
-            if self.debug:
-                print(f"Request received: {request}")
+        A handler may return a coroutine when serving on the event loop; it is
+        returned for the caller to await, with the request timed when it ends.
+        """
+        self.manager.logger.debug("Request: %s %s", request.method, request.path)
 
-            url = self._parse_request(request)
-            if url == "":
-                self.handle_root(client)
-            elif url == "configure":
-                print(f"##########request {request}")
-                self.handle_configure(client, request)
+        started = ticks_ms()
+        route = request.path.rstrip("/") or "/"
+        handlers = self.routes.get(route)
+        if handlers is None:
+            if request.method == "GET" and self.handle_static(client, request):
+                route = "static"
             else:
-                self.handle_not_found(client)
+                route = "not_found"
+                self.handle_not_found(client, request)
+        else:
+            handler = handlers.get(request.method)
+            if handler is None:
+                route = "method_not_allowed"
+                self.handle_method_not_allowed(client, handlers)
+            else:
+                pending = handler(self, client, request)
+                if pending is not None:
+                    return self._finish_async(pending, route, started)
+        self._record(route, started)
+
+    async def _finish_async(self, pending, route, started):
+        await pending
+        self._record(route, started)
+
+    def _record(self, route, started):
+        metrics = self.manager.metrics
+        metrics.inc("requests", route)
+        metrics.observe("request_ms", ticks_diff(ticks_ms(), started), route)
+
+    async def _read_request_async(self, reader, parser):
+        """Read from the stream until the parser has a complete request, or None on EOF."""
+        request = parser.advance(0) if parser.length else None
+        while request is None:
+            chunk = await reader.read(128)
+            if not chunk:
+                if not parser.length:
+                    return None
+                raise RequestError(400)
+            request = parser.feed(chunk)
+        return request
+
+    async def _handle_client_async(self, reader, writer):
+        """Handle a client connection on the asyncio event loop."""
+        parser = self._parsers.pop() if self._parsers else RequestParser()
+        parser.reset()
+        client = _StreamClient(writer)
+        try:
+            for count in range(1, self.max_requests + 1):
+                timeout = self.client_timeout if count == 1 else self.idle_timeout
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request_async(reader, parser), timeout
+                    )
+                except RequestError as error:
+                    self.keep_alive = False
+                    self.handle_error(client, error.status_code)
+                    await writer.drain()
+                    return
+                except asyncio.TimeoutError:
+                    return
+                if request is None:
+                    return
+                self.keep_alive = count < self.max_requests and self._wants_keep_alive(request)
+                keep_alive = self.keep_alive  # Other clients change it while this one waits
+                pending = self._dispatch(client, request)
+                if pending is not None:
+                    await pending
+                await writer.drain()
+                if not keep_alive:
+                    return
+                parser.consume()
         except Exception as error:
-            if self.debug:
-                print(f"Error handling client: {error}")
+            self.manager.logger.debug("Error handling client: %r", error)
         finally:
-            client.close()
+            self._parsers.append(parser)
+            writer.close()
+            await writer.wait_closed()
 
-    def run(self):
-        """Start the web server."""
-        self.wlan_ap.active(True)
-        self.wlan_ap.config(
-            essid=self.ap_ssid, password=self.ap_password, authmode=self.ap_authmode
+    def _start_access_point(self):
+        """Activate the access point and announce the portal address."""
+        manager = self.manager
+        manager.wlan_ap.active(True)
+        manager.wlan_ap.config(
+            essid=manager.ap_ssid, password=manager.ap_password, authmode=manager.ap_authmode
         )
-        print(
-            f"Connect to {self.ap_ssid} with the password {self.ap_password} "
-            f"and access the captive portal at {self.wlan_ap.ifconfig()[0]}"
+        manager.logger.info(
+            "Portal started: connect to %s and open http://%s",
+            manager.ap_ssid,
+            manager.wlan_ap.ifconfig()[0],
         )
 
-        server_socket = self._create_server_socket()
-        while True:
-            if self.wlan_sta.isconnected():
-                self.wlan_ap.active(False)
-                self._reboot_device()
-                return  # just for testing
+    async def serve(self, host="", port=80, backlog=5):
+        """Serve the portal to several clients at once until the STA interface connects."""
+        self._start_access_point()
+        server = await asyncio.start_server(self._handle_client_async, host, port, backlog=backlog)
+        dns = self._create_dns_server(host)
+        dns_task = asyncio.create_task(dns.serve()) if dns is not None else None
+        try:
+            while True:
+                self.scheduler.run_due()
+                if self._done():
+                    break
+                await asyncio.sleep(self._poll_timeout_ms() / 1000)
+        finally:
+            if dns_task is not None:
+                dns_task.cancel()
+                dns.close()
+            server.close()
+            await server.wait_closed()
+        self.manager.wlan_ap.active(False)
+
+    def run_async(self, host="", port=80, backlog=5):
+        """Start the web server on the asyncio event loop."""
+        asyncio.run(self.serve(host, port, backlog))
+
+    def run(self, host="", port=80, backlog=1):
+        """Serve the portal one client at a time until the STA interface connects."""
+        self._start_access_point()
+
+        server_socket = self._create_server_socket(host, port, backlog)
+        dns = self._create_dns_server(host)
+        poller = select.poll()
+        poller.register(server_socket, select.POLLIN)
+        if dns is not None:
+            poller.register(dns.socket, select.POLLIN)
+        try:
+            while True:
+                self.scheduler.run_due()
+                if self._done():
+                    self.manager.wlan_ap.active(False)
+                    return  # just for testing
+
+                # Entries are (object, event, ...): some ports add more fields
+                for entry in poller.poll(self._poll_timeout_ms()):
+                    ready = entry[0]
+                    if dns is not None and dns.owns(ready):
+                        dns.handle()
+                    else:
+                        client, _ = server_socket.accept()
+                        self._handle_client(client)
+        finally:
+            if dns is not None:
+                dns.close()
+            server_socket.close()
 
-            client, _ = server_socket.accept()
-            self._handle_client(client)
+    def send_header(self, client, status_code=200, headers=_HTML_HEADERS, length=None):
+        """Start a buffered HTTP response to the client."""
+        writer = self.writer
+        writer.begin(client)
+        status_line = _STATUS_LINES.get(status_code)
+        if status_line is None:
+            # The reason phrase is optional; the status code is what clients act on
+            status_line = ("HTTP/1.1 %d \r\n" % status_code).encode()
+        writer.write(status_line)
+        writer.write(headers)
+        if length is not None:
+            writer.write(_CONTENT_LENGTH)
+            writer.write(str(length))
+            writer.write(_CRLF)
+        writer.write(_KEEP_ALIVE if self.keep_alive else _CLOSE)
+        return writer
 
-    def send_header(self, client, status_code=200):
-        """Send HTTP headers to the client."""
-        client.send(f"HTTP/1.1 {status_code} OK\r\n".encode("utf-8"))
-        client.send("Content-Type: text/html\r\n".encode("utf-8"))
-        client.send("Connection: close\r\n\r\n".encode("utf-8"))
+    def send_json(self, client, payload, status_code=200):
+        """Send an HTTP response with an already serialized JSON payload."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        writer = self.send_header(client, status_code, _JSON_HEADERS, len(payload))
+        writer.write(payload)
+        writer.flush()
 
-    def send_response(self, client, payload, status_code=200):
+    def send_response(self, client, payload, status_code=200, headers=_HTML_HEADERS):
         """Send an HTTP response with HTML content."""
-        self.send_header(client, status_code)
-        client.sendall(
-            f"""
-            <!DOCTYPE html>
-            <html lang="en">
-                <head>
-                    <title>WiFi Manager</title>
-                    <meta charset="UTF-8">
-                    <meta name="viewport" content="width=device-width, initial-scale=1">
-                    <link rel="icon" href="data:,">
-                </head>
-                <body>
-                    {payload}
-                </body>
-            </html>
-            """.encode("utf-8")
-        )
-        client.close()
-
-    def handle_root(self, client):
-        """Handle the root URL."""
-        ssid_options = "".join(
-            f"""
-            <p><input type="radio" name="ssid" value="{ssid.decode("utf-8")}" 
-            id="{ssid.decode("utf-8")}">
-            <label for="{ssid.decode("utf-8")}">&nbsp;{ssid.decode("utf-8")}</label></p>
-            """
-            for ssid, *_ in self.wlan_sta.scan()
-        )
-        self.send_response(
-            client,
-            f"""
-            <h1>WiFi Manager</h1>
-            <form action="/configure" method="post" accept-charset="utf-8">
-                {ssid_options}
-                <p><label for="password">Password:&nbsp;</label>
-                <input type="password" id="password" name="password"></p>
-                <p><input type="submit" value="Connect"></p>
-            </form>
-            """,
-        )
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        length = len(_PAGE_HEAD) + len(payload) + len(_PAGE_TAIL)
+        writer = self.send_header(client, status_code, headers, length)
+        writer.write(_PAGE_HEAD)
+        writer.write(payload)
+        writer.write(_PAGE_TAIL)
+        writer.flush()
+
+    def handle_root(self, client, request=None):
+        """Handle the root URL, with the static directory's index.html if it has one."""
+        if request is not None and self.handle_static(client, request, "/index.html"):
+            return
+        if request is not None and request.headers.get("if-none-match") == _ROOT_ETAG:
+            writer = self.send_header(client, 304, _NOT_MODIFIED_HEADERS)
+        else:
+            writer = self.send_header(client, 200, _ROOT_HEADERS)
+            writer.write(_ROOT_PAGE)
+        writer.flush()
+
+    def handle_static(self, client, request, path=None):
+        """Stream a file from the static directory. Returns False if there is no such file."""
+        if self.static is None:
+            return False
+        gzip = "gzip" in request.headers.get("accept-encoding", "")
+        found = self.static.find(path or request.path, gzip)
+        if found is None:
+            return False
+        file_path, size, etag, headers = found
+        if request.headers.get("if-none-match") == etag:
+            self.send_header(client, 304, headers).flush()
+            return True
+        with open(file_path, "rb") as file:
+            writer = self.send_header(client, 200, headers, size)
+            writer.write_file(file)
+            writer.flush()
+        return True
+
+    def _configure_fields(self, request):
+        """Return the (ssid, password) submitted in the form body, or None."""
+        try:
+            form = parse_form(request.body)
+        except ValueError:
+            return None
+        if "ssid" not in form or "password" not in form:
+            return None
+        return form["ssid"], form["password"]
+
+    def _finish_configure(self, ssid, password, connected):
+        """Save the network once connected, or refuse new attempts for a while."""
+        if connected:
+            self.manager.credentials.set(ssid, password)
+            if self.manager.reboot:
+                self._reboot_device()
+            else:
+                # Let the browser get its answer before the portal hands over to the application
+                self.scheduler.call_later(self.handoff_delay_ms, _handed_off)
+        else:
+            self.configure_locked = True
+            self.scheduler.call_later(self.configure_cooldown_ms, self._unlock_configure)
+
+    def _unlock_configure(self):
+        self.configure_locked = False
+
+    def _connect(self, answer, client, ssid, password):
+        """Join the network, then ``answer(client, ssid, password, connected)``.
+
+        On the event loop this returns a coroutine, so other clients are
+        served while the connection is pending; otherwise it blocks.
+        """
+        if isinstance(client, _StreamClient):
+            return self._connect_async(answer, client, ssid, password)
+        answer(client, ssid, password, self.manager.wifi_connect(ssid, password))
+
+    async def _connect_async(self, answer, client, ssid, password):
+        # One attempt at a time: the STA interface is shared
+        keep_alive = self.keep_alive
+        self.configure_locked = self._connecting = True
+        try:
+            connected = await self.manager.wifi_connect_async(ssid, password)
+        finally:
+            self.configure_locked = self._connecting = False
+        # Other clients were served in the meantime
+        self.keep_alive = keep_alive
+        answer(client, ssid, password, connected)
 
     def handle_configure(self, client, request):
         """Handle the configure URL."""
-        match = re.search(b"ssid=([^&]*)&password=(.*)", url_decode(request))
-        if not match:
-            self.send_response(client, "<p>Parameters not found!</p>", 400)
+        if self.configure_locked:
+            self.send_response(client, _RETRY_LATER_PAGE, 503)
+            return
+        fields = self._configure_fields(request)
+        if fields is None:
+            self.send_response(client, _MISSING_FIELDS_PAGE, 400)
             return
 
-        ssid = match.group(1).decode("utf-8")
-        password = match.group(2).decode("utf-8")
-
+        ssid, password = fields
         if not ssid:
-            self.send_response(
-                client, "<p>SSID must be provided!</p><p>Go back and try again!</p>", 400
-            )
-        elif self.manager.wifi_connect(ssid, password):
+            self.send_response(client, _MISSING_SSID_PAGE, 400)
+            return
+        return self._connect(self._answer_configure, client, ssid, password)
+
+    def _answer_configure(self, client, ssid, password, connected):
+        if connected:
             self.send_response(
                 client,
                 f"<p>Successfully connected to</p><h1>{ssid}</h1><p>IP address: "
-                f"{self.wlan_sta.ifconfig()[0]}</p>",
+                f"{self.manager.wlan_sta.ifconfig()[0]}</p>",
             )
-            profiles = read_credentials(self.wifi_credentials, self.debug)
-            profiles[ssid] = password
-            write_credentials(self.wifi_credentials, profiles)
-            self._reboot_device()
         else:
             self.send_response(
                 client, f"<p>Could not connect to</p><h1>{ssid}</h1><p>Go back and try again!</p>"
             )
-            self.sleep_fn(5)
+        self._finish_configure(ssid, password, connected)
+
+    def handle_api_networks(self, client, request=None):
+        """List the scanned networks as [ssid, rssi, authmode] entries."""
+        networks = [
+            [network[0].decode("utf-8"), network[3], network[4]]
+            for network in self.manager.scan_cache.results()
+            if network[0]
+        ]
+        self.send_json(client, json.dumps(networks))
+
+    def handle_api_configure(self, client, request):
+        """Same as the configure URL, answering in JSON."""
+        if self.configure_locked:
+            self.send_json(client, _RETRY_LATER_JSON, 503)
+            return
+        fields = self._configure_fields(request)
+        if fields is None or not fields[0]:
+            self.send_json(client, _INVALID_PARAMETERS_JSON, 400)
+            return
+
+        ssid, password = fields
+        return self._connect(self._answer_api_configure, client, ssid, password)
 
-    def handle_not_found(self, client):
+    def _answer_api_configure(self, client, ssid, password, connected):
+        if connected:
+            status = {"connected": True, "ip": self.manager.wlan_sta.ifconfig()[0]}
+        else:
+            status = {"connected": False, "error": self.manager.last_failure}
+        self.send_json(client, json.dumps(status))
+        self._finish_configure(ssid, password, connected)
+
+    def handle_api_status(self, client, request=None):
+        """Report whether the STA interface is connected, and its address."""
+        connected = self.manager.wlan_sta.isconnected()
+        ip = self.manager.wlan_sta.ifconfig()[0] if connected else None
+        self.send_json(client, json.dumps({"connected": connected, "ip": ip}))
+
+    def handle_logs(self, client, request=None):
+        """List the recent log entries as [ticks_ms, level, message], oldest first."""
+        entries = [
+            [ticks, LEVEL_NAMES.get(level, level), message]
+            for ticks, level, message in self.manager.logger.records()
+        ]
+        self.send_json(client, json.dumps(entries))
+
+    def handle_metrics(self, client, request=None):
+        """Handle the metrics URL."""
+        self.send_json(client, self.manager.metrics.to_json())
+
+    def handle_error(self, client, status_code):
+        """Reply to a request that could not be parsed."""
+        self.send_response(client, _BAD_REQUEST_PAGE, status_code)
+
+    def handle_not_found(self, client, request=None):
         """Handle unknown URLs."""
-        self.send_response(client, "<p>Page not found!</p>", 404)
+        self.send_response(client, _NOT_FOUND_PAGE, 404)
+
+    def handle_method_not_allowed(self, client, handlers):
+        """Reply to a known URL requested with a method it has no handler for."""
+        allow = ", ".join(handlers).encode()
+        self.send_response(
+            client, _METHOD_NOT_ALLOWED_PAGE, 405, _HTML_HEADERS + _ALLOW + allow + _CRLF
+        )
+
+
+# Built-in pages, by path and method; WebServer.route() adds to a copy of its own
+_ROUTES = {
+    "/": {"GET": WebServer.handle_root},
+    "/configure": {"POST": WebServer.handle_configure},
+    "/api/networks": {"GET": WebServer.handle_api_networks},
+    "/api/configure": {"POST": WebServer.handle_api_configure},
+    "/api/status": {"GET": WebServer.handle_api_status},
+    "/metrics": {"GET": WebServer.handle_metrics},
+    "/logs": {"GET": WebServer.handle_logs},
+}
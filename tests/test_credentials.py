@@ -0,0 +1,132 @@
+import os
+
+import pytest
+from wifi_manager.credentials import CredentialStore, MAGIC, MAX_PASSWORD, MAX_SSID
+
+
+def test_credentials_roundtrip_with_separator_in_password(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path)
+    assert store.set("home", "pa;ss=word")
+    assert store.set("café", "")
+    assert CredentialStore(path).load() == {"home": "pa;ss=word", "café": ""}
+
+
+def test_credentials_skip_unchanged_write(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path)
+    store.set("home", "secret")
+    size = os.stat(path)[6]
+    assert store.set("home", "secret") is False
+    assert os.stat(path)[6] == size
+
+
+def test_credentials_update_appends_then_compacts(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path, max_profiles=2)
+    store.set("home", "one")
+    size = os.stat(path)[6]
+    store.set("home", "two")
+    # An update appends a single record instead of rewriting the file
+    assert os.stat(path)[6] == size + len(b"\x04home\x03two")
+    for password in ("three", "four", "five"):
+        store.set("home", password)
+    # Superseded records are dropped once the log grows too long
+    assert os.stat(path)[6] < size + 4 * len(b"\x04home\x03two")
+    assert CredentialStore(path).get("home") == "five"
+
+
+def test_credentials_bounded_profile_count(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path, max_profiles=2)
+    store.set("first", "1")
+    store.set("second", "2")
+    store.set("first", "updated")
+    store.set("third", "3")
+    # The least recently updated profile is evicted
+    assert CredentialStore(path).load() == {"first": "updated", "third": "3"}
+
+
+def test_credentials_remove(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path)
+    store.set("home", "secret")
+    store.set("work", "secret")
+    assert store.remove("home")
+    assert store.remove("home") is False
+    assert CredentialStore(path).load() == {"work": "secret"}
+
+
+def test_credentials_ignore_truncated_record(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    CredentialStore(path).set("home", "secret")
+    with open(path, "ab") as file:
+        file.write(b"\x04wo")
+    store = CredentialStore(path)
+    assert store.load() == {"home": "secret"}
+    store.set("work", "other")
+    assert CredentialStore(path).load() == {"home": "secret", "work": "other"}
+
+
+def test_credentials_migrate_legacy_format(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    with open(path, "w") as file:
+        file.write("home;pa;ss\nstray line\n\nwork;secret\n")
+    store = CredentialStore(path)
+    assert store.load() == {"home": "pa;ss", "work": "secret"}
+    store.set("cafe", "latte")
+    with open(path, "rb") as file:
+        assert file.read().startswith(MAGIC)
+    assert CredentialStore(path).load() == {"home": "pa;ss", "work": "secret", "cafe": "latte"}
+
+
+def test_credentials_recover_interrupted_replace(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    CredentialStore(path).set("home", "secret")
+    os.rename(path, path + ".tmp")
+    store = CredentialStore(path)
+    assert store.load() == {"home": "secret"}
+    store.set("work", "other")
+    assert CredentialStore(path).load() == {"home": "secret", "work": "other"}
+
+
+def test_credentials_skip_corrupt_records(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    with open(path, "wb") as file:
+        file.write(MAGIC + b"\x04ab\xffc\x02pw" + b"\x04home\x06secret" + b"\x04work\x02\xfe\xff")
+    store = CredentialStore(path)
+    assert store.load() == {"home": "secret"}
+    # The next write drops the corrupt records
+    store.set("cafe", "latte")
+    with open(path, "rb") as file:
+        assert b"\xff" not in file.read()
+    assert CredentialStore(path).load() == {"home": "secret", "cafe": "latte"}
+
+
+def test_credentials_skip_corrupt_legacy_lines(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    with open(path, "wb") as file:
+        file.write(b"caf\xe9;latte\nhome;secret\nwork;\xff\n")
+    assert CredentialStore(path).load() == {"home": "secret"}
+
+
+def test_credentials_reject_oversized_profiles(tmp_path):
+    path = str(tmp_path / "wifi.dat")
+    store = CredentialStore(path)
+    store.set("home", "secret")
+    for ssid, password in (
+        ("x" * (MAX_SSID + 1), "secret"),
+        ("", "secret"),
+        ("home", "p" * 255),
+        ("work", "p" * (MAX_PASSWORD + 1)),
+        ("work", "é" * 33),
+    ):
+        with pytest.raises(ValueError):
+            store.set(ssid, password)
+    with pytest.raises(ValueError):
+        store.replace({"home": "secret", "work": "p" * 256})
+    # Nothing changed, in memory or on flash
+    assert store.load() == {"home": "secret"}
+    assert CredentialStore(path).load() == {"home": "secret"}
+    assert store.set("x" * MAX_SSID, "p" * MAX_PASSWORD)
+    assert CredentialStore(path).get("x" * MAX_SSID) == "p" * MAX_PASSWORD
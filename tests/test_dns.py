@@ -0,0 +1,55 @@
+import socket
+from wifi_manager.dns import DNSServer
+
+# Query for example.com, type A, with recursion desired
+QUERY_A = b"\xab\xcd\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x07example\x03com\x00\x00\x01\x00\x01"
+QUERY_AAAA = QUERY_A[:-4] + b"\x00\x1c\x00\x01"
+
+
+def _respond(dns, query):
+    dns.buffer[: len(query)] = query
+    return bytes(dns.buffer[: dns.build_response(len(query))])
+
+
+def test_dns_answers_a_query_with_ap_address():
+    response = _respond(DNSServer("192.168.4.1"), QUERY_A)
+    assert response[:2] == b"\xab\xcd"
+    assert response[2:4] == b"\x85\x00"
+    assert response[4:12] == b"\x00\x01\x00\x01\x00\x00\x00\x00"
+    assert response[12 : len(QUERY_A)] == QUERY_A[12:]
+    assert response[len(QUERY_A) :] == (
+        b"\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x3c\x00\x04" + bytes([192, 168, 4, 1])
+    )
+
+
+def test_dns_empty_answer_for_other_types():
+    response = _respond(DNSServer("192.168.4.1"), QUERY_AAAA)
+    assert response[6:8] == b"\x00\x00"
+    assert len(response) == len(QUERY_AAAA)
+
+
+def test_dns_drops_malformed_packets():
+    dns = DNSServer("192.168.4.1")
+    assert _respond(dns, b"\x00\x01") == b""
+    # A response rather than a query
+    assert _respond(dns, b"\xab\xcd\x81" + QUERY_A[3:]) == b""
+    # Question name running past the end of the packet
+    assert _respond(dns, QUERY_A[:20]) == b""
+
+
+def test_dns_handle_over_udp():
+    dns = DNSServer("10.0.0.1", port=0)
+    dns.open("127.0.0.1")
+    try:
+        assert dns.handle() is False
+        port = dns.socket.getsockname()[1]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as resolver:
+            resolver.settimeout(1)
+            resolver.sendto(QUERY_A, ("127.0.0.1", port))
+            dns.socket.setblocking(True)
+            assert dns.handle() is True
+            response = resolver.recv(512)
+        assert response.endswith(bytes([10, 0, 0, 1]))
+        assert dns.owns(dns.socket)
+    finally:
+        dns.close()
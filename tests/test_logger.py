@@ -0,0 +1,35 @@
+from wifi_manager.logger import DEBUG, INFO, WARNING, Logger
+
+
+def test_logger_ring_buffer_keeps_latest_entries():
+    now = [0]
+    logger = Logger(size=3, echo=False, clock=lambda: now[0])
+    assert logger.records() == []
+    for index in range(5):
+        now[0] = index
+        logger.info("entry %d", index)
+    assert logger.records() == [(2, INFO, "entry 2"), (3, INFO, "entry 3"), (4, INFO, "entry 4")]
+    # The ring is preallocated and never grows
+    assert len(logger.entries) == 3
+    logger.clear()
+    assert logger.records() == []
+
+
+def test_logger_disabled_levels_are_not_formatted():
+    class Loud:
+        def __str__(self):
+            raise AssertionError("formatted a disabled message")
+
+    logger = Logger(WARNING, echo=False)
+    logger.debug("%s", Loud())
+    logger.info("%s", Loud())
+    logger.warning("kept %s", "this")
+    assert [entry[1:] for entry in logger.records()] == [(WARNING, "kept this")]
+    logger.level = DEBUG
+    logger.debug("now %s", "visible")
+    assert logger.records()[-1][1:] == (DEBUG, "now visible")
+
+
+def test_logger_echo(capsys):
+    Logger().error("disk %s", "full")
+    assert capsys.readouterr().out == "ERROR disk full\n"
@@ -10,29 +10,46 @@ if "network" not in sys.modules:
 
 import pytest
 from unittest.mock import patch, Mock
+from wifi_manager.history import ConnectionHistory, MAX_DURATIONS
 from wifi_manager.manager import WifiManager
 from wifi_manager.network_utils import write_credentials
 
 
 @pytest.fixture(autouse=True)
-def patch_network(monkeypatch):
+def patch_network(monkeypatch, tmp_path):
     import wifi_manager.manager as manager_mod
 
+    # Keep the saved credentials and connection history out of the working tree
+    monkeypatch.chdir(tmp_path)
+    # The portal modules are unloaded after the portal runs; other tests still use them
+    package = sys.modules["wifi_manager"]
+    for name, module in list(sys.modules.items()):
+        if name.startswith("wifi_manager."):
+            monkeypatch.setitem(sys.modules, name, module)
+            monkeypatch.setattr(package, name.split(".", 1)[1], module, raising=False)
+
     # Create mock WLAN class
     mock_wlan = Mock()
     mock_wlan._connected = False
     mock_wlan.isconnected.side_effect = lambda: mock_wlan._connected
-    mock_wlan.scan.return_value = [(b"ssid1",), (b"ssid2",)]
+    mock_wlan.scan.return_value = [
+        (b"ssid1", b"bssid1", 1, -60, 3, False),
+        (b"ssid2", b"bssid2", 6, -70, 3, False),
+    ]
     mock_wlan.ifconfig.return_value = ("192.168.1.2", "255.255.255.0", "192.168.1.1", "8.8.8.8")
-    mock_wlan.connect.side_effect = lambda ssid, password: setattr(
+    mock_wlan.connect.side_effect = lambda ssid, password, bssid=None: setattr(
         mock_wlan, "_connected", ssid == "ssid1" and password == "pass1"
     )
     mock_wlan.disconnect.side_effect = lambda: setattr(mock_wlan, "_connected", False)
+    mock_wlan.status.return_value = 1001
 
     # Mock the network module
     sys.modules["network"] = types.ModuleType("network")
     sys.modules["network"].STA_IF = 0
     sys.modules["network"].AP_IF = 1
+    sys.modules["network"].STAT_CONNECTING = 1001
+    sys.modules["network"].STAT_WRONG_PASSWORD = 202
+    sys.modules["network"].STAT_NO_AP_FOUND = 201
     sys.modules["network"].WLAN = lambda iface: mock_wlan
 
     # Patch the network module
@@ -56,38 +73,103 @@ def test_wifi_manager_password_length():
         WifiManager(password="short")
 
 
-def test_wifi_manager_connect(tmp_path):
+def test_wifi_manager_connect():
     wm = WifiManager(ssid="TestSSID", password="TestPass123")
-    wm.wifi_credentials = str(tmp_path / "wifi.dat")
 
     # Save credentials for ssid1
-    write_credentials(wm.wifi_credentials, {"ssid1": "pass1"})
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
+    wm.connect()
+    assert wm.is_connected()
+
+
+def test_wifi_manager_connect_does_not_load_portal(monkeypatch):
+    monkeypatch.delitem(sys.modules, "wifi_manager.webserver", raising=False)
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
     wm.connect()
     assert wm.is_connected()
+    assert "wifi_manager.webserver" not in sys.modules
 
 
-@patch("wifi_manager.manager.read_credentials", return_value={})
-def test_wifi_manager_connected_already(mock_read_credentials):
+def test_wifi_manager_connected_already():
     wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.credentials = Mock()
     wm.wlan_sta._connected = True  # Simulate already connected
     wm.connect()
-    mock_read_credentials.assert_not_called()
+    wm.credentials.load.assert_not_called()
 
 
-@patch("wifi_manager.manager.WebServer")
-def test_wifi_manager_connect_not_connected_and_no_credentials(mock_webserver, tmp_path):
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_connect_not_connected_and_no_credentials(mock_webserver):
     mock_instance = Mock()
     mock_webserver.return_value = mock_instance
     wm = WifiManager(ssid="TestSSID", password="TestPass123")
-    wm.wifi_credentials = str(tmp_path / "wifi.dat")
 
-    write_credentials(wm.wifi_credentials, {"ssid3": "pass3"})
+    write_credentials(wm.credentials.path, {"ssid3": "pass3"})
     wm.connect()
     assert not wm.is_connected()
-    mock_webserver.assert_called_once_with(wm)
+    mock_webserver.assert_called_once_with(wm, static_dir=None)
     mock_instance.run.assert_called_once()
 
 
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_corrupt_credentials_start_portal(mock_webserver):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    with open(wm.credentials.path, "wb") as file:
+        file.write(b"WMC\x01\x04ab\xffc\x02pw")
+    wm.connect()
+    assert not wm.is_connected()
+    mock_webserver.return_value.run.assert_called_once()
+
+
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_portal_handoff_frees_portal(mock_webserver):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", reboot=False)
+    mock_webserver.return_value.run.side_effect = lambda: setattr(wm.wlan_sta, "_connected", True)
+    wm.connect()
+    # connect() returns to the application with the link made in the portal
+    assert wm.is_connected()
+    assert "wifi_manager.webserver" not in sys.modules
+    assert "wifi_manager.request" not in sys.modules
+    assert "wifi_manager.credentials" in sys.modules
+
+
+def test_wifi_manager_route_added_to_portal():
+    from wifi_manager.request import Request
+    from wifi_manager.webserver import WebServer
+
+    def settings(server, client, request):
+        server.send_json(client, b'{"page":"settings"}')
+
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", reboot=False)
+    wm.route("/settings", settings)
+    client = Mock()
+    responses = []
+    client.sendall.side_effect = lambda data: responses.append(bytes(data))
+
+    def run(server):
+        server._dispatch(client, Request("GET", "/settings", "", "HTTP/1.1", {}, b""))
+        wm.wlan_sta._connected = True
+
+    with patch.object(WebServer, "run", run):
+        wm.connect()
+    assert responses[0].startswith(b"HTTP/1.1 200 OK")
+    assert responses[0].endswith(b'{"page":"settings"}')
+
+
+@patch("wifi_manager.manager.time")
+def test_wifi_manager_logs_connection_attempts(mock_time, capsys):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.logger.echo = False
+    wm.wifi_connect("ssid1", "wrong", timeout_ms=300)
+    wm.wifi_connect("ssid1", "pass1")
+    messages = [message for _, _, message in wm.logger.records()]
+    assert messages[:2] == ["Connecting to ssid1", "Connection failed: timeout"]
+    assert messages[3].startswith("Connected in ")
+    # Nothing reaches the console, not even progress dots
+    assert capsys.readouterr().out == ""
+
+
 def test_wifi_manager_disconnect():
     wm = WifiManager(ssid="TestSSID", password="TestPass123")
     wm.wlan_sta._connected = True
@@ -115,3 +197,346 @@ def test_manager_wifi_connect_99times_failure_then_ok(mock_time):
     assert ret is True
     mock_time.sleep_ms.assert_called_with(100)
     assert mock_time.sleep_ms.call_count == 99
+
+
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_web_server_async(mock_webserver):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", use_async=True)
+    wm.web_server()
+    mock_webserver.return_value.run_async.assert_called_once()
+    mock_webserver.return_value.run.assert_not_called()
+
+
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_connect_scans_once_for_portal(mock_webserver):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.connect()
+    # The portal reads the same cache, so a failed boot costs a single scan
+    wm.scan_cache.results()
+    assert wm.wlan_sta.scan.call_count == 1
+
+
+def test_wifi_manager_candidates_ranked_by_rssi_and_deduplicated():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.scan.return_value = [
+        (b"weak", b"ap1", 1, -85, 3, False),
+        (b"home", b"ap2", 6, -70, 3, False),
+        (b"home", b"ap3", 11, -50, 3, False),
+        (b"unknown", b"ap4", 1, -30, 3, False),
+    ]
+    profiles = {"weak": "pass", "home": "pass"}
+    assert wm._candidates(profiles) == [("home", b"ap3", 11), ("weak", b"ap1", 1)]
+
+
+def test_wifi_manager_connects_to_saved_network_among_many():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
+    wm.wlan_sta.scan.return_value = [
+        (b"other%02d" % i, b"bssid", 6, -40 - i, 3, False) for i in range(20)
+    ] + [(b"ssid1", b"bssid1", 1, -80, 3, False)]
+    assert wm.try_connect()
+    wm.wlan_sta.connect.assert_called_with("ssid1", "pass1", bssid=b"bssid1")
+
+
+def test_wifi_manager_candidates_use_history():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.scan.return_value = [
+        (b"flaky", b"ap1", 1, -55, 3, False),
+        (b"stable", b"ap2", 6, -65, 3, False),
+    ]
+    for _ in range(3):
+        wm.history.record_failure("flaky")
+        wm.history.record_success("stable")
+    wm.history.save()
+
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    profiles = {"flaky": "pass", "stable": "pass"}
+    assert [ssid for ssid, *_ in wm._candidates(profiles)] == ["stable", "flaky"]
+
+
+def test_wifi_manager_connect_records_history():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1", "ssid2": "wrong"})
+    wm.wlan_sta.scan.return_value = [
+        (b"ssid2", b"bssid2", 6, -40, 3, False),
+        (b"ssid1", b"bssid1", 1, -60, 3, False),
+    ]
+    with patch("wifi_manager.manager.time"):
+        wm.connect()
+    assert wm.is_connected()
+    wm.wlan_sta.connect.assert_called_with("ssid1", "pass1", bssid=b"bssid1")
+    assert wm.history.load()["profiles"] == {"ssid2": [0, 1], "ssid1": [1, 0]}
+
+
+def test_history_adaptive_timeout():
+    history = ConnectionHistory("history.json")
+    assert history.timeout_ms("home", 10000) == 10000
+    history.record_duration("home", 1500)
+    assert history.timeout_ms("home") == 3250
+    history.dirty = False
+    history.record_duration("home", 1400)
+    # The slowest recent connection still sets the timeout, so nothing is written
+    assert history.timeout_ms("home") == 3250
+    assert not history.dirty
+    for _ in range(MAX_DURATIONS):
+        history.record_duration("home", 100)
+    assert history.timeout_ms("home") == 2000
+    history.record_duration("office", 60000)
+    assert history.timeout_ms("office") == 20000
+
+
+def _slow_network(wm, join_ms):
+    """Make ssid1 take join_ms to connect, on a clock advanced by the mocked sleeps."""
+    now = [0]
+    started = [0]
+    connect = wm.wlan_sta.connect.side_effect
+
+    def slow_connect(ssid, password, bssid=None):
+        started[0] = now[0]
+        connect(ssid, password, bssid)
+
+    wm.wlan_sta.connect.side_effect = slow_connect
+    wm.wlan_sta.isconnected.side_effect = lambda: (
+        wm.wlan_sta._connected and now[0] - started[0] >= join_ms
+    )
+    return now
+
+
+@patch("wifi_manager.manager.time")
+def test_wifi_manager_slow_network_learns_timeout(mock_time):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
+    now = _slow_network(wm, 12000)
+    mock_time.sleep_ms.side_effect = lambda ms: now.__setitem__(0, now[0] + ms)
+    with patch("wifi_manager.manager.ticks_ms", lambda: now[0]):
+        assert not wm.try_connect()
+        assert wm.last_failure == "timeout"
+        # The network may be slow rather than gone: the next attempt waits longer
+        assert wm.connect_timeout_for("ssid1") == 16000
+        assert wm.try_connect()
+    assert wm.connect_timeout_for("ssid1") == 19000
+    assert wm.connect_timeout_for("ssid2") == 10000
+
+
+@patch("wifi_manager.manager.time")
+def test_wifi_manager_connect_deadline(mock_time):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", connect_deadline_ms=15000)
+    write_credentials(wm.credentials.path, {"ssid1": "slow", "ssid2": "slow"})
+    now = [0]
+    mock_time.sleep_ms.side_effect = lambda ms: now.__setitem__(0, now[0] + ms)
+    with patch("wifi_manager.manager.ticks_ms", lambda: now[0]):
+        assert not wm.try_connect()
+    assert now[0] == 15000
+    assert wm.wlan_sta.connect.call_count == 2
+    # The attempt cut short by the deadline says nothing about the network
+    assert wm.history.timeout_ms("ssid2") is None
+
+
+def test_wifi_manager_fast_reconnect_skips_scan():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
+    wm.connect()
+    assert wm.history.last() == ("ssid1", b"bssid1", 1)
+
+    # Next boot
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.scan.reset_mock()
+    wm.connect()
+    assert wm.is_connected()
+    wm.wlan_sta.scan.assert_not_called()
+    wm.wlan_sta.connect.assert_called_with("ssid1", "pass1", bssid=b"bssid1")
+
+
+@patch("wifi_manager.webserver.WebServer")
+def test_wifi_manager_fast_reconnect_falls_back_to_scan(mock_webserver):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1"})
+    wm.history.set_last("ssid1", b"moved", 11)
+    connect = wm.wlan_sta.connect.side_effect
+    wm.wlan_sta.connect.side_effect = lambda ssid, password, bssid=None: connect(
+        ssid, password if bssid != b"moved" else "stale"
+    )
+    with patch("wifi_manager.manager.time"):
+        wm.connect()
+    assert wm.is_connected()
+    wm.wlan_sta.scan.assert_called_once()
+    assert wm.history.last() == ("ssid1", b"bssid1", 1)
+    mock_webserver.assert_not_called()
+
+
+@pytest.mark.parametrize("status, cause", [(202, "wrong_password"), (201, "no_ap_found")])
+@patch("wifi_manager.manager.time")
+def test_manager_wifi_connect_fails_early_on_status(mock_time, status, cause):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.status.side_effect = [1001, 1001, status]
+    assert wm.wifi_connect("ssid1", "wrong") is False
+    assert mock_time.sleep_ms.call_count == 2
+    assert wm.last_failure == cause
+
+
+@patch("wifi_manager.manager.time")
+def test_manager_wifi_connect_timeout(mock_time):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", connect_timeout_ms=3000)
+    assert wm.wifi_connect("ssid1", "wrong") is False
+    assert mock_time.sleep_ms.call_count == 30
+    assert wm.wifi_connect("ssid1", "wrong", timeout_ms=500) is False
+    assert mock_time.sleep_ms.call_count == 35
+    assert wm.last_failure == "timeout"
+
+
+def test_manager_wifi_connect_async():
+    import asyncio
+
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.isconnected.side_effect = [False, False, True]
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        result = await wm.wifi_connect_async("ssid1", "pass1")
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result is True
+    # Other tasks kept running while the connection was pending
+    assert ticks > 1
+
+
+@patch("wifi_manager.manager.time")
+def test_manager_connect_metrics(mock_time):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    write_credentials(wm.credentials.path, {"ssid1": "pass1", "ssid2": "wrong"})
+    wm.wlan_sta.scan.return_value = [
+        (b"ssid2", b"bssid2", 6, -40, 3, False),
+        (b"ssid1", b"bssid1", 1, -60, 3, False),
+    ]
+    wm.wlan_sta.status.side_effect = [202, 1001]
+    wm.connect()
+    snapshot = wm.metrics.snapshot()
+    assert snapshot["counters"] == {
+        "connect_attempts": 2,
+        "connect_failures": {"wrong_password": 1},
+        "connect_successes": 1,
+    }
+    assert snapshot["histograms"]["scan_ms"]["count"] == 1
+    assert snapshot["histograms"]["time_to_connect_ms"]["count"] == 1
+
+
+def test_wifi_manager_power_profile_applied_on_connect():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", power_profile="low-power")
+    wm.wlan_sta.PM_POWERSAVE = 2
+    wm.wifi_connect("ssid1", "pass1")
+    wm.wlan_sta.config.assert_any_call(pm=2)
+    wm.wlan_sta.config.assert_any_call(txpower=8.5)
+
+
+def test_wifi_manager_power_profile_default_left_alone():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wifi_connect("ssid1", "pass1")
+    wm.wlan_sta.config.assert_not_called()
+
+
+def test_wifi_manager_power_profile_unknown():
+    with pytest.raises(ValueError):
+        WifiManager(ssid="TestSSID", password="TestPass123", power_profile="turbo")
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    with pytest.raises(ValueError):
+        wm.set_power_profile("turbo")
+
+
+def test_wifi_manager_power_profile_switch_at_runtime():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.wlan_sta.PM_NONE = 0
+    # Only stored while disconnected, applied on the next connection
+    wm.set_power_profile("performance")
+    wm.wlan_sta.config.assert_not_called()
+    wm.wlan_sta._connected = True
+    wm.set_power_profile("performance")
+    wm.wlan_sta.config.assert_any_call(pm=0)
+    wm.wlan_sta.config.assert_any_call(txpower=20)
+
+
+def test_wifi_manager_power_profile_unsupported_setting():
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", power_profile="balanced")
+    wm.logger.echo = False
+    wm.wlan_sta._connected = True
+
+    def config(**kwargs):
+        if "txpower" in kwargs:
+            raise ValueError("unknown config param")
+
+    wm.wlan_sta.config.side_effect = config
+    wm.set_power_profile("balanced")
+    # The power-management mode is still set
+    wm.wlan_sta.config.assert_any_call(pm=wm.wlan_sta.PM_PERFORMANCE)
+    messages = [message for _, _, message in wm.logger.records()]
+    assert any(message.startswith("Power setting not supported: txpower") for message in messages)
+
+
+@patch("wifi_manager.ping.ping")
+def test_wifi_manager_benchmark_power_profiles(mock_ping):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", power_profile="balanced")
+    wm.logger.echo = False
+    wm.wlan_sta._connected = True
+    mock_ping.side_effect = lambda host, port, count: {
+        "min_ms": 1.0,
+        "avg_ms": 2.0 if wm.power_profile == "performance" else 30.0,
+        "max_ms": 40.0,
+        "lost": 0,
+    }
+    results = wm.benchmark_power_profiles(("performance", "low-power"), count=3)
+    assert results["performance"]["avg_ms"] == 2.0
+    assert results["low-power"]["avg_ms"] == 30.0
+    mock_ping.assert_called_with("192.168.1.1", 80, 3)
+    assert wm.power_profile == "balanced"
+    assert wm.metrics.snapshot()["histograms"]["rtt_ms"]["performance"]["count"] == 1
+
+
+@patch("wifi_manager.ping.ping")
+def test_wifi_manager_benchmark_restores_firmware_settings(mock_ping):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123")
+    wm.logger.echo = False
+    wm.wlan_sta._connected = True
+    wm.wlan_sta.PM_NONE, wm.wlan_sta.PM_POWERSAVE = 0, 2
+    radio = {"pm": 1, "txpower": 17}
+
+    def config(*args, **kwargs):
+        if args:
+            return radio[args[0]]
+        radio.update(kwargs)
+
+    wm.wlan_sta.config.side_effect = config
+    mock_ping.return_value = {"min_ms": 1.0, "avg_ms": 2.0, "max_ms": 3.0, "lost": 0}
+    wm.benchmark_power_profiles(("performance", "low-power"), count=3)
+    # Without a profile the settings found before the benchmark are put back
+    assert wm.power_profile is None
+    assert radio == {"pm": 1, "txpower": 17}
+
+
+@patch("wifi_manager.ping.ping")
+def test_wifi_manager_benchmark_restores_profile(mock_ping):
+    wm = WifiManager(ssid="TestSSID", password="TestPass123", power_profile="balanced")
+    wm.logger.echo = False
+    wm.wlan_sta._connected = True
+    wm.wlan_sta.PM_PERFORMANCE, wm.wlan_sta.PM_POWERSAVE = 1, 2
+    radio = {}
+
+    def config(*args, **kwargs):
+        if args:
+            return radio[args[0]]
+        radio.update(kwargs)
+
+    wm.wlan_sta.config.side_effect = config
+    wm.set_power_profile("balanced")
+    mock_ping.return_value = {"min_ms": None, "avg_ms": None, "max_ms": None, "lost": 3}
+    wm.benchmark_power_profiles(("low-power",), count=3)
+    assert wm.power_profile == "balanced"
+    assert radio == {"pm": 1, "txpower": 15}
@@ -0,0 +1,107 @@
+import sys
+import types
+
+if "machine" not in sys.modules:
+    sys.modules["machine"] = types.ModuleType("machine")
+    sys.modules["machine"].reset = lambda: None
+if "network" not in sys.modules:
+    sys.modules["network"] = types.ModuleType("network")
+
+import tracemalloc
+import pytest
+import wifi_manager.manager as manager_mod
+from wifi_manager.manager import WifiManager
+from wifi_manager.webserver import WebServer
+
+# Peak traced allocation on CPython, in bytes, with some headroom over the measured cost
+MANAGER_BUDGET = 4096
+PORTAL_BUDGET = 4096  # Mostly the request and response buffers
+REQUEST_BUDGET = 2048
+
+
+class _WLAN:
+    """Plain WLAN stand-in, so the fake itself costs next to nothing to trace."""
+
+    def __init__(self, interface):
+        self.connected = False
+
+    def active(self, state=None):
+        return True
+
+    def config(self, **kwargs):
+        pass
+
+    def connect(self, ssid, password, bssid=None):
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def isconnected(self):
+        return self.connected
+
+    def status(self):
+        return 1001
+
+    def scan(self):
+        return [(b"ssid1", b"bssid1", 1, -60, 3, False)]
+
+    def ifconfig(self):
+        return ("192.168.4.1", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+
+
+class _Client:
+    def __init__(self, request):
+        self.request = request
+
+    def settimeout(self, timeout):
+        pass
+
+    def readinto(self, buffer):
+        size = len(self.request)
+        buffer[:size] = self.request
+        self.request = b""
+        return size
+
+    def sendall(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def patch_network(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    network = types.ModuleType("network")
+    network.STA_IF = 0
+    network.AP_IF = 1
+    network.STAT_WRONG_PASSWORD = 202
+    network.STAT_NO_AP_FOUND = 201
+    network.WLAN = _WLAN
+    monkeypatch.setattr(manager_mod, "network", network)
+
+
+def _peak(fn):
+    """Peak traced allocation while fn() runs."""
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        return tracemalloc.get_traced_memory()[1] - base, result
+    finally:
+        tracemalloc.stop()
+
+
+def test_manager_heap_budget():
+    peak, _ = _peak(WifiManager)
+    assert peak < MANAGER_BUDGET
+
+
+def test_portal_request_heap_budget():
+    manager = WifiManager()
+    peak, server = _peak(lambda: WebServer(manager))
+    assert peak < PORTAL_BUDGET
+    request = b"GET / HTTP/1.1\r\nHost: 192.168.4.1\r\n\r\n"
+    peak, _ = _peak(lambda: server._handle_client(_Client(request)))
+    assert peak < REQUEST_BUDGET
@@ -0,0 +1,35 @@
+import json
+from unittest.mock import patch
+from wifi_manager.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets():
+    histogram = Histogram(bounds=(10, 100))
+    for value in (5, 10, 50, 1000):
+        histogram.observe(value)
+    assert histogram.to_dict() == {"count": 4, "sum": 1065, "max": 1000, "buckets": [2, 1, 1]}
+
+
+def test_metrics_counters_and_labels():
+    metrics = Metrics()
+    metrics.inc("connect_attempts")
+    metrics.inc("connect_attempts")
+    metrics.inc("connect_failures", "wrong_password")
+    metrics.observe("scan_ms", 1500)
+    metrics.observe("request_ms", 3, "/")
+    snapshot = json.loads(metrics.to_json())
+    assert snapshot["counters"] == {
+        "connect_attempts": 2,
+        "connect_failures": {"wrong_password": 1},
+    }
+    assert snapshot["histograms"]["scan_ms"]["count"] == 1
+    assert snapshot["histograms"]["request_ms"]["/"]["max"] == 3
+
+
+def test_metrics_reports_free_heap():
+    with patch("wifi_manager.metrics.gc") as mock_gc:
+        mock_gc.mem_free.return_value = 80000
+        mock_gc.mem_alloc.return_value = 20000
+        snapshot = Metrics().snapshot()
+    assert snapshot["mem_free"] == 80000
+    assert snapshot["mem_alloc"] == 20000
@@ -1,4 +1,12 @@
-from wifi_manager.network_utils import write_credentials, read_credentials, url_decode
+import pytest
+from unittest.mock import patch
+from wifi_manager.logger import Logger
+from wifi_manager.network_utils import (
+    parse_form,
+    read_credentials,
+    url_decode,
+    write_credentials,
+)
 
 
 def test_write_and_read_credentials(tmp_path):
@@ -15,6 +23,18 @@ def test_write_and_read_credentials_exception(tmp_path):
     assert loaded == {}
 
 
+def test_read_credentials_reports_errors(tmp_path, capsys):
+    file_path = str(tmp_path / "wifi.dat")
+    logger = Logger(echo=False)
+    with patch("wifi_manager.network_utils.CredentialStore", side_effect=OSError(5)):
+        assert read_credentials(file_path, logger=logger) == {}
+        assert capsys.readouterr().out == ""
+        # The deprecated flag still reports on the console
+        assert read_credentials(file_path, True) == {}
+    assert logger.records()[0][2] == "Could not read credentials: OSError(5)"
+    assert capsys.readouterr().out == "WARNING Could not read credentials: OSError(5)\n"
+
+
 def test_write_and_read_empty_credentials(tmp_path):
     file_path = tmp_path / "wifi.dat"
     profiles = {}
@@ -44,3 +64,31 @@ def test_url_decode_invalid_percent():
     # Should not raise, just return as-is
     assert url_decode("abc%zz") == b"abc%zz"
     assert url_decode(b"abc%zz") == b"abc%zz"
+
+
+def test_parse_form_fields():
+    assert parse_form(b"ssid=Home&password=secret") == {"ssid": "Home", "password": "secret"}
+    # Field order and extra parameters do not matter
+    assert parse_form("password=secret&remember=on&ssid=Home") == {
+        "password": "secret",
+        "remember": "on",
+        "ssid": "Home",
+    }
+    assert parse_form(b"") == {}
+    assert parse_form(b"flag&&empty=") == {"flag": "", "empty": ""}
+
+
+def test_parse_form_decodes_values():
+    form = parse_form(b"ssid=My+Home%20WiFi&password=a%26b%3Dc%2Bd+%25")
+    assert form == {"ssid": "My Home WiFi", "password": "a&b=c+d %"}
+    assert parse_form(b"ssid=Caf%C3%A9") == {"ssid": "Café"}
+
+
+def test_parse_form_invalid_escapes():
+    assert parse_form(b"password=100%&ssid=%zz%2") == {"password": "100%", "ssid": "%zz%2"}
+    assert parse_form(b"password=%+1") == {"password": "% 1"}
+
+
+def test_parse_form_invalid_utf8():
+    with pytest.raises(ValueError):
+        parse_form(b"ssid=%FF")
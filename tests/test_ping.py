@@ -0,0 +1,51 @@
+import errno
+import socket
+
+import pytest
+from unittest.mock import patch
+from wifi_manager.ping import ping
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@patch("wifi_manager.ping.time")
+def test_ping_listening_port(mock_time):
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen(5)
+        stats = ping("127.0.0.1", server.getsockname()[1], count=3, interval_ms=50)
+    assert stats["lost"] == 0
+    assert 0 <= stats["min_ms"] <= stats["avg_ms"] <= stats["max_ms"]
+    mock_time.sleep_ms.assert_called_with(50)
+    assert mock_time.sleep_ms.call_count == 2
+
+
+@patch("wifi_manager.ping.time")
+def test_ping_refused_port_counts_as_round_trip(mock_time, closed_port):
+    stats = ping("127.0.0.1", closed_port, count=2)
+    assert stats["lost"] == 0
+    assert stats["avg_ms"] is not None
+
+
+@patch("wifi_manager.ping.time")
+@patch("wifi_manager.ping.socket.socket")
+def test_ping_all_lost(mock_socket, mock_time):
+    mock_socket.return_value.connect.side_effect = OSError(110)
+    stats = ping("127.0.0.1", 80, count=4)
+    assert stats == {"min_ms": None, "avg_ms": None, "max_ms": None, "lost": 4}
+    assert mock_socket.return_value.close.call_count == 4
+
+
+@pytest.mark.parametrize("code", [errno.ECONNREFUSED, errno.ECONNRESET, errno.ECONNABORTED])
+@patch("wifi_manager.ping.time")
+@patch("wifi_manager.ping.socket.socket")
+def test_ping_reset_counts_as_round_trip(mock_socket, mock_time, code):
+    mock_socket.return_value.connect.side_effect = OSError(code)
+    stats = ping("127.0.0.1", 80, count=2)
+    assert stats["lost"] == 0
+    assert stats["avg_ms"] is not None
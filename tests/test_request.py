@@ -0,0 +1,47 @@
+import pytest
+from wifi_manager.request import RequestError, RequestParser
+
+
+def test_parser_request_line_and_headers():
+    parser = RequestParser()
+    request = parser.feed(b"GET /status?verbose=1 HTTP/1.1\r\nHost: 192.168.4.1\r\n\r\n")
+    assert request.method == "GET"
+    assert request.path == "/status"
+    assert request.query == "verbose=1"
+    assert request.version == "HTTP/1.1"
+    assert request.headers == {"host": "192.168.4.1"}
+    assert request.body == b""
+
+
+def test_parser_incremental_with_split_terminator():
+    parser = RequestParser()
+    for chunk in (b"POST /configure HTTP/1.1\r\nContent-", b"Length: 9\r\n\r", b"\nssid=", b"a&"):
+        assert parser.feed(chunk) is None
+    request = parser.feed(b"bc")
+    assert request.headers["content-length"] == "9"
+    assert request.body == b"ssid=a&bc"
+
+
+def test_parser_receives_into_free_buffer():
+    parser = RequestParser()
+    data = b"GET / HTTP/1.1\r\n\r\n"
+    parser.free()[: len(data)] = data
+    assert parser.advance(len(data)).path == "/"
+
+
+@pytest.mark.parametrize(
+    "data, status_code",
+    [
+        (b"BAD REQUEST\r\n\r\n", 400),
+        (b"POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n", 400),
+        (b"POST / HTTP/1.1\r\nContent-Length: -5\r\n\r\nGET / HTTP/1.1\r\n\r\n", 400),
+        (b"POST / HTTP/1.1\r\nContent-Length: 100000\r\n\r\n", 413),
+        (b"GET / HTTP/1.1\r\nCookie: " + b"a" * 2000, 431),
+        (b"GET / HTTP/1.1\r\nCookie: " + b"a" * 1400 + b"\r\n\r\n", 431),
+    ],
+)
+def test_parser_rejects_invalid_requests(data, status_code):
+    parser = RequestParser(max_header=1024, max_body=512)
+    with pytest.raises(RequestError) as error:
+        parser.feed(data)
+    assert error.value.status_code == status_code
@@ -0,0 +1,57 @@
+from unittest.mock import Mock
+from wifi_manager.scan_cache import ScanCache
+
+
+def _network(ssid, rssi):
+    return (ssid, b"\x00" * 6, 1, rssi, 3, False)
+
+
+def test_scan_cache_reuses_results_until_ttl():
+    now = [0]
+    wlan = Mock()
+    wlan.scan.return_value = [_network(b"ssid1", -60)]
+    cache = ScanCache(wlan, ttl_ms=1000, clock=lambda: now[0])
+
+    assert cache.results() == [_network(b"ssid1", -60)]
+    now[0] = 999
+    cache.results()
+    assert wlan.scan.call_count == 1
+
+    now[0] = 1000
+    cache.results()
+    assert wlan.scan.call_count == 2
+
+
+def test_scan_cache_refresh_on_demand():
+    wlan = Mock()
+    wlan.scan.return_value = []
+    cache = ScanCache(wlan)
+    cache.results()
+    cache.results(refresh=True)
+    assert wlan.scan.call_count == 2
+    cache.invalidate()
+    cache.results()
+    assert wlan.scan.call_count == 3
+
+
+def test_scan_cache_keeps_strongest_entries():
+    wlan = Mock()
+    wlan.scan.return_value = [
+        _network(b"weak", -90),
+        _network(b"strong", -40),
+        _network(b"mid", -70),
+    ]
+    cache = ScanCache(wlan, max_entries=2)
+    assert [network[0] for network in cache.results()] == [b"strong", b"mid"]
+
+
+def test_scan_cache_keeps_saved_networks_and_one_entry_per_ssid():
+    wlan = Mock()
+    wlan.scan.return_value = [_network(b"ap%02d" % i, -40 - i) for i in range(20)]
+    wlan.scan.return_value += [_network(b"ap00", -41), _network(b"ap00", -45)]
+    wlan.scan.return_value.append(_network(b"home", -80))
+    cache = ScanCache(wlan, max_entries=16, keep=lambda: {"home": "secret"})
+    ssids = [network[0] for network in cache.results()]
+    # Duplicates do not take slots, and the saved network is kept past the bound
+    assert ssids == [b"ap%02d" % i for i in range(16)] + [b"home"]
+    assert cache.results()[0][3] == -40
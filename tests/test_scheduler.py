@@ -0,0 +1,61 @@
+from unittest.mock import Mock, patch
+from wifi_manager.scheduler import Scheduler
+
+
+def test_scheduler_runs_actions_in_deadline_order():
+    now = [0]
+    calls = []
+    scheduler = Scheduler(clock=lambda: now[0])
+    scheduler.call_later(300, calls.append, "third")
+    scheduler.call_later(100, calls.append, "first")
+    scheduler.call_later(100, calls.append, "second")
+    assert scheduler.next_delay_ms() == 100
+
+    now[0] = 99
+    scheduler.run_due()
+    assert calls == []
+    now[0] = 150
+    scheduler.run_due()
+    assert calls == ["first", "second"]
+    assert scheduler.next_delay_ms() == 150
+    now[0] = 1000
+    scheduler.run_due()
+    assert calls == ["first", "second", "third"]
+    assert scheduler.next_delay_ms() is None
+
+
+def test_scheduler_cancel():
+    now = [0]
+    callback = Mock()
+    scheduler = Scheduler(clock=lambda: now[0])
+    entry = scheduler.call_later(10, callback)
+    scheduler.cancel(entry)
+    now[0] = 10
+    scheduler.run_due()
+    callback.assert_not_called()
+    assert scheduler.pending() == 0
+
+
+def _wrapping_ticks_diff(end, start):
+    # MicroPython ticks wrap at 2**30
+    return ((end - start + 2**29) % 2**30) - 2**29
+
+
+@patch("wifi_manager.scheduler.ticks_diff", _wrapping_ticks_diff)
+def test_scheduler_deadlines_across_ticks_wrap():
+    now = [2**30 - 100]
+    calls = []
+    scheduler = Scheduler(clock=lambda: now[0])
+    scheduler.call_later(50, calls.append, "before wrap")
+    now[0] = 10  # The clock wrapped, before the first action ran
+    scheduler.call_later(10, calls.append, "after wrap")
+    assert scheduler.next_delay_ms() == 0
+
+    # The overdue action is not held up behind the one set after the wrap
+    now[0] = 15
+    scheduler.run_due()
+    assert calls == ["before wrap"]
+    assert scheduler.next_delay_ms() == 5
+    now[0] = 20
+    scheduler.run_due()
+    assert calls == ["before wrap", "after wrap"]
@@ -0,0 +1,44 @@
+from wifi_manager.static import StaticFiles
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_static_find_file(tmp_path):
+    _write(tmp_path / "style.css", b"body{}")
+    static = StaticFiles(str(tmp_path) + "/", max_age=60)
+    file_path, size, etag, headers = static.find("/style.css")
+    assert file_path == str(tmp_path / "style.css")
+    assert size == 6
+    assert headers.startswith(b"Content-Type: text/css\r\n")
+    assert b"Cache-Control: max-age=60\r\n" in headers
+    assert b"ETag: %s\r\n" % etag.encode() in headers
+    assert b"Content-Encoding" not in headers
+
+
+def test_static_prefers_gzip_when_accepted(tmp_path):
+    _write(tmp_path / "app.js", b"console.log(1)")
+    _write(tmp_path / "app.js.gz", b"\x1f\x8b compressed")
+    static = StaticFiles(str(tmp_path))
+    file_path, size, gzip_etag, headers = static.find("/app.js", gzip=True)
+    assert file_path.endswith("app.js.gz")
+    assert size == 13
+    assert headers.startswith(b"Content-Type: application/javascript\r\n")
+    assert b"Content-Encoding: gzip\r\n" in headers
+    file_path, _, etag, _ = static.find("/app.js")
+    assert file_path.endswith("app.js")
+    assert etag != gzip_etag
+
+
+def test_static_missing_and_unsafe_paths(tmp_path):
+    _write(tmp_path / "www" / "index.html", b"<h1>Hi</h1>")
+    _write(tmp_path / "secret.dat", b"password")
+    static = StaticFiles(str(tmp_path / "www"))
+    assert static.find("/missing.html") is None
+    assert static.find("/../secret.dat") is None
+    # Directories are served through their index.html
+    assert static.find("/")[0].endswith("index.html")
+    (tmp_path / "www" / "sub").mkdir()
+    assert static.find("/sub") is None
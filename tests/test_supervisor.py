@@ -0,0 +1,67 @@
+from unittest.mock import Mock, patch
+from wifi_manager.supervisor import ConnectionSupervisor
+
+
+def _manager(connected=True):
+    manager = Mock()
+    manager.is_connected.return_value = connected
+    return manager
+
+
+def test_supervisor_fires_callbacks_on_link_changes():
+    manager = _manager()
+    on_connect, on_disconnect = Mock(), Mock()
+    supervisor = ConnectionSupervisor(manager, on_connect, on_disconnect, interval_ms=500)
+
+    assert supervisor.poll() == 500
+    on_connect.assert_not_called()
+
+    manager.is_connected.return_value = False
+    manager.try_connect.return_value = False
+    supervisor.poll()
+    on_disconnect.assert_called_once()
+
+    manager.try_connect.return_value = True
+    assert supervisor.poll() == 500
+    on_connect.assert_called_once()
+    on_disconnect.assert_called_once()
+
+
+@patch("wifi_manager.supervisor.random")
+def test_supervisor_exponential_backoff_with_jitter(mock_random):
+    manager = _manager(connected=False)
+    manager.try_connect.return_value = False
+    supervisor = ConnectionSupervisor(manager, backoff_min_ms=1000, backoff_max_ms=5000)
+
+    mock_random.getrandbits.return_value = 0
+    assert [supervisor.poll() for _ in range(5)] == [500, 1000, 2000, 2500, 2500]
+    mock_random.getrandbits.return_value = 65535
+    assert 4990 < supervisor.poll() < 5000
+
+    manager.try_connect.return_value = True
+    supervisor.poll()
+    assert supervisor.failures == 0
+
+
+def test_supervisor_run_reconnects_without_blocking():
+    import asyncio
+
+    manager = _manager(connected=False)
+
+    async def try_connect_async():
+        manager.is_connected.return_value = True
+        return True
+
+    manager.try_connect_async = try_connect_async
+    connected = []
+    supervisor = ConnectionSupervisor(manager, on_connect=lambda: connected.append(True))
+    supervisor.interval_ms = 10
+
+    async def scenario():
+        task = asyncio.create_task(supervisor.run())
+        await asyncio.sleep(0.05)
+        supervisor.stop()
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(scenario())
+    assert connected == [True]
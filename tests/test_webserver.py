@@ -7,86 +7,201 @@ if "machine" not in sys.modules:
 
 import pytest
 from unittest.mock import patch, Mock
+from wifi_manager.logger import Logger
+from wifi_manager.metrics import Metrics
+from wifi_manager.request import Request
 from wifi_manager.webserver import WebServer
 
 
+def _client(*chunks):
+    """Mock socket whose readinto() returns the given chunks, then EOF."""
+    client = Mock()
+    pending = list(chunks)
+
+    def readinto(buffer):
+        if not pending:
+            return 0
+        chunk = pending.pop(0)
+        if isinstance(chunk, type) and issubclass(chunk, Exception):
+            raise chunk
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    client.readinto.side_effect = readinto
+    return client
+
+
+def _form_request(body):
+    return Request("POST", "/configure", "", "HTTP/1.1", {}, body)
+
+
 @pytest.fixture
 def mock_manager():
     mock = Mock()
     mock.wlan_ap.ifconfig.return_value = ["192.168.4.1"]
     mock.wlan_sta.isconnected.return_value = False
     mock.wlan_sta.scan.return_value = [(b"TestSSID",)]
+    mock.scan_cache.results.return_value = [(b"TestSSID", b"bssid1", 1, -60, 3, False)]
     mock.ap_ssid = "MyAP"
     mock.ap_password = "password123"
     mock.ap_authmode = 3
     mock.reboot = False
-    mock.wifi_credentials = "wifi.dat"
     mock.wifi_connect.return_value = True
+    mock.last_failure = None
+    mock.metrics = Metrics()
+    mock.logger = Logger(echo=False)
     return mock
 
 
 def test_reboot_device_true(mock_manager):
-    mock_sleep = Mock()
+    now = [0]
     mock_reset = Mock()
-    server = WebServer(mock_manager, sleep_fn=mock_sleep, reset_fn=mock_reset)
-    server.reboot = True
+    server = WebServer(mock_manager, reset_fn=mock_reset)
+    server.scheduler.clock = lambda: now[0]
+    mock_manager.reboot = True
     server._reboot_device()
-    mock_sleep.assert_called_once_with(5)
+    server._reboot_device()
+    # The reboot is scheduled once, without blocking
+    assert server.scheduler.pending() == 1
+    now[0] = 4999
+    server.scheduler.run_due()
+    mock_reset.assert_not_called()
+    now[0] = 5000
+    server.scheduler.run_due()
+    mock_reset.assert_called_once()
 
 
 def test_reboot_device_false(mock_manager):
-    mock_sleep = Mock()
     mock_reset = Mock()
-    server = WebServer(mock_manager, sleep_fn=mock_sleep, reset_fn=mock_reset)
+    server = WebServer(mock_manager, reset_fn=mock_reset)
 
-    server.reboot = False
+    mock_manager.reboot = False
     server._reboot_device()
-    mock_sleep.assert_not_called()
+    assert server.scheduler.pending() == 0
+
+
+@patch.object(WebServer, "_handle_client")
+@patch.object(WebServer, "_create_server_socket")
+@patch("wifi_manager.webserver.select")
+def test_run_serves_until_reboot(mock_select, mock_create_socket, mock_handle_client, mock_manager):
+    """After a successful configuration the portal keeps serving until the reboot."""
+    now = [0]
+    mock_reset = Mock()
+    server = WebServer(mock_manager, reset_fn=mock_reset)
+    server.scheduler.clock = lambda: now[0]
+    mock_manager.reboot = True
+    server.captive_dns = False
+    mock_socket = mock_create_socket.return_value
+    mock_socket.accept.return_value = (Mock(), None)
+    mock_manager.wlan_sta.isconnected.return_value = True
+    poller = mock_select.poll.return_value
+
+    def poll(timeout):
+        now[0] += timeout
+        return [(mock_socket, 1)]
+
+    poller.poll.side_effect = poll
+    server.run()
+    mock_reset.assert_called_once()
+    # Clients were still served while the reboot was pending
+    assert mock_handle_client.call_count == 10
+    mock_manager.wlan_ap.active.assert_called_with(False)
+
+
+@patch.object(WebServer, "_create_server_socket")
+@patch("wifi_manager.webserver.select")
+def test_run_hands_off_without_reboot(mock_select, mock_create_socket, mock_manager):
+    """A successful configuration returns from run() with the STA up, after a short grace."""
+    now = [0]
+    mock_reset = Mock()
+    server = WebServer(mock_manager, reset_fn=mock_reset)
+    server.scheduler.clock = lambda: now[0]
+    server.captive_dns = False
+    mock_socket = mock_create_socket.return_value
+    mock_socket.accept.side_effect = lambda: (
+        _client(
+            b"POST /configure HTTP/1.1\r\nContent-Length: 26\r\n\r\nssid=Kimmies&password=1234"
+        ),
+        None,
+    )
+    connected = [False]
+    mock_manager.wlan_sta.ifconfig.return_value = ["192.168.1.2"]
+    mock_manager.wlan_sta.isconnected.side_effect = lambda: connected[0]
+
+    def wifi_connect(ssid, password):
+        connected[0] = True
+        return True
+
+    mock_manager.wifi_connect.side_effect = wifi_connect
 
+    def poll(timeout):
+        now[0] += timeout
+        return [(mock_socket, 1)] if not connected[0] else []
 
-def test_run_no_connection_then_ok(mock_manager):
+    mock_select.poll.return_value.poll.side_effect = poll
+    server.run()
+    mock_reset.assert_not_called()
+    mock_manager.credentials.set.assert_called_once_with("Kimmies", "1234")
+    # The portal stayed up for the grace period, then released the AP and its socket
+    assert now[0] >= server.handoff_delay_ms
+    mock_manager.wlan_ap.active.assert_called_with(False)
+    mock_socket.close.assert_called_once()
+
+
+@patch.object(WebServer, "_create_dns_server")
+@patch.object(WebServer, "_handle_client")
+@patch.object(WebServer, "_create_server_socket")
+@patch("wifi_manager.webserver.select")
+def test_run_no_connection_then_ok(
+    mock_select, mock_create_socket, mock_handle_client, mock_create_dns, mock_manager
+):
     server = WebServer(mock_manager)
-    mock_socket = Mock()
-    server._create_server_socket = Mock(return_value=mock_socket)
-    server._handle_client = Mock()
+    mock_socket = mock_create_socket.return_value
     client = Mock()
     mock_socket.accept.return_value = (client, None)
     mock_manager.wlan_sta.isconnected.side_effect = [False, True]
+    dns = mock_create_dns.return_value
+    dns.owns.side_effect = lambda ready: ready is dns.socket
+    # MicroPython may report more than (object, event) per entry
+    mock_select.poll.return_value.poll.return_value = [(mock_socket, 1, None), (dns.socket, 1)]
 
     server.run()
     mock_socket.accept.assert_called_once()
-    server._handle_client.assert_called_once_with(client)
+    mock_handle_client.assert_called_once_with(client)
+    dns.handle.assert_called_once()
+    dns.close.assert_called_once()
 
 
-def test_parse_request_valid(mock_manager):
+def test_send_header(mock_manager):
     server = WebServer(mock_manager)
-    request = b"GET /configure HTTP/1.1\r\n\r\n"
-    url = server._parse_request(request)
-    assert url == "configure"
-
-
-def test_parse_request_invalid(mock_manager, capsys):
-    server = WebServer(mock_manager, debug=True)
-    request = b"BAD REQUEST"
-    url = server._parse_request(request)
-    captured = capsys.readouterr()
-    assert url is None
-    assert "Error parsing request" in captured.out
+    client = Mock()
+    server.send_header(client)
+    server.writer.flush()
+    # Status line and headers go out in a single call
+    client.sendall.assert_called_once()
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 200 OK\r\n")
 
 
-def test_send_header(mock_manager):
+def test_send_header_unlisted_status(mock_manager):
     server = WebServer(mock_manager)
     client = Mock()
-    server.send_header(client)
-    assert client.send.call_count == 3
+    server.send_json(client, "{}", 401)
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 401 \r\n")
+    server.send_response(client, "x", 500)
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 500 \r\n")
 
 
 def test_send_response(mock_manager):
     server = WebServer(mock_manager)
     client = Mock()
     server.send_response(client, "<h1>Hello</h1>")
-    client.sendall.assert_called()
-    client.close.assert_called()
+    client.sendall.assert_called_once()
+    response = bytes(client.sendall.call_args[0][0])
+    headers, body = response.split(b"\r\n\r\n", 1)
+    assert f"Content-Length: {len(body)}".encode() in headers
+    assert b"Connection: close" in headers
+    # Closing the connection is left to the caller
+    client.close.assert_not_called()
 
 
 def test_handle_root(mock_manager):
@@ -96,12 +211,129 @@ def test_handle_root(mock_manager):
     client.sendall.assert_called()
 
 
-@patch("wifi_manager.webserver.write_credentials")
-def test_handle_configure_success(mock_write, mock_manager):
-    server = WebServer(mock_manager, sleep_fn=lambda x: None, reset_fn=lambda: None)
+def test_handle_root_etag(mock_manager):
+    server = WebServer(mock_manager)
+    client = Mock()
+    server.handle_root(client)
+    response = bytes(client.sendall.call_args_list[0][0][0])
+    headers = response.split(b"\r\n\r\n")[0]
+    assert b"Cache-Control: no-cache" in headers
+    etag = [line for line in headers.split(b"\r\n") if line.startswith(b"ETag: ")][0][6:]
+
+    client = Mock()
+    request = Request("GET", "/", "", "HTTP/1.1", {"if-none-match": etag.decode()}, b"")
+    server.handle_root(client, request)
+    client.sendall.assert_called_once()
+    response = bytes(client.sendall.call_args[0][0])
+    assert response.startswith(b"HTTP/1.1 304 Not Modified\r\n")
+    assert response.endswith(b"\r\n\r\n")
+
+
+def test_handle_static_streams_in_chunks(mock_manager, tmp_path):
+    script = bytes(range(256)) * 8
+    (tmp_path / "app.js").write_bytes(script)
+    server = WebServer(mock_manager, static_dir=str(tmp_path))
+    client = _client(b"GET /app.js HTTP/1.1\r\nConnection: close\r\n\r\n")
+    chunks = []
+    client.sendall.side_effect = lambda data: chunks.append(bytes(data))
+    server._handle_client(client)
+    headers, body = b"".join(chunks).split(b"\r\n\r\n", 1)
+    assert headers.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"Content-Length: 2048\r\n" in headers
+    assert body == script
+    # Sent through the response buffer, never as a whole
+    assert max(len(chunk) for chunk in chunks) == len(server.writer.buffer)
+
+
+def test_handle_static_gzip_and_etag(mock_manager, tmp_path):
+    (tmp_path / "index.html").write_bytes(b"<h1>Branded</h1>")
+    (tmp_path / "index.html.gz").write_bytes(b"\x1f\x8bgzipped")
+    server = WebServer(mock_manager, static_dir=str(tmp_path))
+    server.blocking_keep_alive = True
+    client = _client(b"GET / HTTP/1.1\r\nAccept-Encoding: gzip, deflate\r\n\r\n")
+    server._handle_client(client)
+    response = bytes(client.sendall.call_args[0][0])
+    assert b"Content-Encoding: gzip\r\n" in response
+    assert response.endswith(b"\x1f\x8bgzipped")
+    etag = response.split(b"ETag: ")[1].split(b"\r\n")[0].decode()
+
+    client = _client(
+        b"GET / HTTP/1.1\r\nAccept-Encoding: gzip\r\nIf-None-Match: %s\r\n\r\n" % etag.encode()
+    )
+    server._handle_client(client)
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 304 Not Modified\r\n")
+
+    # Without gzip support, and for unknown files, the plain copy or a 404 is sent
+    client = _client(b"GET / HTTP/1.1\r\n\r\n", b"GET /missing.css HTTP/1.1\r\n\r\n")
+    responses = []
+    client.sendall.side_effect = lambda data: responses.append(bytes(data))
+    server._handle_client(client)
+    first, second = responses
+    assert first.endswith(b"<h1>Branded</h1>")
+    assert second.startswith(b"HTTP/1.1 404")
+
+
+def test_handle_api_networks(mock_manager):
+    import json
+
+    mock_manager.scan_cache.results.return_value = [
+        (b"Home", b"ap1", 1, -50, 3, False),
+        (b"", b"ap2", 6, -60, 3, True),
+        (b"Caf\xc3\xa9", b"ap3", 11, -70, 0, False),
+    ]
+    server = WebServer(mock_manager)
+    client = Mock()
+    server.handle_api_networks(client)
+    response = bytes(client.sendall.call_args[0][0])
+    headers, body = response.split(b"\r\n\r\n", 1)
+    assert b"Content-Type: application/json" in headers
+    assert json.loads(body) == [["Home", -50, 3], ["Café", -70, 0]]
+
+
+def test_handle_api_configure(mock_manager):
+    import json
+
+    server = WebServer(mock_manager)
+    client = Mock()
+    mock_manager.wlan_sta.ifconfig.return_value = ["192.168.1.20"]
+    server.handle_api_configure(client, _form_request(b"ssid=Home&password=secret"))
+    body = bytes(client.sendall.call_args[0][0]).split(b"\r\n\r\n", 1)[1]
+    assert json.loads(body) == {"connected": True, "ip": "192.168.1.20"}
+    mock_manager.credentials.set.assert_called_once_with("Home", "secret")
+
+    client = Mock()
+    mock_manager.wifi_connect.return_value = False
+    mock_manager.last_failure = "wrong_password"
+    server.handle_api_configure(client, _form_request(b"ssid=Home&password=wrong"))
+    body = bytes(client.sendall.call_args[0][0]).split(b"\r\n\r\n", 1)[1]
+    assert json.loads(body) == {"connected": False, "error": "wrong_password"}
+
+    # Further attempts are refused until the cooldown ends
+    client = Mock()
+    server.handle_api_configure(client, _form_request(b"ssid=Home&password=other"))
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 503")
+    server._unlock_configure()
+
+    client = Mock()
+    server.handle_api_configure(client, _form_request(b"password=wrong"))
+    assert bytes(client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 400")
+
+
+def test_handle_api_status(mock_manager):
+    import json
+
+    server = WebServer(mock_manager)
+    client = Mock()
+    server.handle_api_status(client)
+    body = bytes(client.sendall.call_args[0][0]).split(b"\r\n\r\n", 1)[1]
+    assert json.loads(body) == {"connected": False, "ip": None}
+
+
+def test_handle_configure_success(mock_manager):
+    server = WebServer(mock_manager, reset_fn=lambda: None)
     client = Mock()
     mock_manager.wlan_sta.ifconfig.return_value = ["192.168.4.1"]
-    test_request = (
+    mock_client = _client(
         b"POST /configure HTTP/1.1\r\n"
         b"Host: 192.168.4.1\r\nConnection: keep-alive\r\n"
         b"Content-Length: 26\r\nCache-Control: max-age=0\r\n"
@@ -114,9 +346,9 @@ def test_handle_configure_success(mock_write, mock_manager):
         b"Referer: http://192.168.4.1/\r\nAccept-Encoding: gzip, deflate\r\n"
         b"Accept-Language: en-GB,en-US;q=0.9,en;q=0.8,ko;q=0.7\r\n\r\nssid=Kimmies&password=1234"
     )
-    server.handle_configure(client, test_request)
+    server.handle_configure(client, server._read_request(mock_client))
     client.sendall.assert_called()
-    mock_write.assert_called()
+    mock_manager.credentials.set.assert_called_once_with("Kimmies", "1234")
 
 
 @patch("wifi_manager.webserver.socket")
@@ -139,17 +371,16 @@ def test_create_server_socket(mock_socket, mock_manager):
 
 def test_handle_client_root(mock_manager):
     """Test handling a client request for the root URL."""
-    mock_client = Mock()
-    mock_client.recv.side_effect = [
-        b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n",  # Simulate HTTP GET request
-    ]
+    mock_client = _client(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
     server = WebServer(mock_manager, debug=True)
+    mock_handle_root = Mock(return_value=None)
+    server.route("/", mock_handle_root)
 
-    with patch.object(server, "handle_root") as mock_handle_root:
-        server._handle_client(mock_client)
+    server._handle_client(mock_client)
 
-        # Verify the root handler was called
-        mock_handle_root.assert_called_once_with(mock_client)
+    # Verify the root handler was called
+    mock_handle_root.assert_called_once()
+    assert mock_handle_root.call_args[0][:2] == (server, mock_client)
 
     # Verify the client connection was closed
     mock_client.close.assert_called_once()
@@ -157,38 +388,63 @@ def test_handle_client_root(mock_manager):
 
 def test_handle_client_connection_closed(mock_manager):
     server = WebServer(mock_manager)
-    mock_client = Mock()
     # Empty chunk simulates closed connection
-    mock_client.recv.side_effect = [b"GET /", b"", b"more data"]
+    mock_client = _client(b"GET /", b"", b"more data")
 
     server._handle_client(mock_client)
 
     # Should stop after receiving empty chunk
-    assert mock_client.recv.call_count == 2
-    # from handle_not_found
+    assert mock_client.readinto.call_count == 2
+    # The incomplete request is rejected
     mock_client.sendall.assert_called_once()
-    mock_client.close.assert_called()
-    assert mock_client.close.call_count == 2
+    assert bytes(mock_client.sendall.call_args[0][0]).startswith(b"HTTP/1.1 400")
+    mock_client.close.assert_called_once()
+
+
+def test_handle_client_invalid_request(mock_manager):
+    server = WebServer(mock_manager)
+    mock_client = _client(b"BAD REQUEST\r\n\r\n")
+    with patch.object(WebServer, "handle_error") as mock_handle_error:
+        server._handle_client(mock_client)
+        mock_handle_error.assert_called_once_with(mock_client, 400)
+    mock_client.close.assert_called_once()
+
+
+def test_handle_client_body_in_later_segment(mock_manager):
+    """The form body may arrive after the headers, in a separate TCP segment."""
+    server = WebServer(mock_manager)
+    mock_client = _client(
+        b"POST /configure HTTP/1.1\r\nContent-Length: 34\r\n\r\n",
+        b"ssid=TestSSID&",
+        b"password=TestPass123",
+    )
+    mock_handle_configure = Mock(return_value=None)
+    server.route("/configure", mock_handle_configure, ("POST",))
+    server._handle_client(mock_client)
+    request = mock_handle_configure.call_args[0][2]
+    assert request.body == b"ssid=TestSSID&password=TestPass123"
 
 
 def test_handle_client_configure(mock_manager):
     """Test handling a client request for the configure URL."""
-    mock_client = Mock()
-    mock_client.recv.side_effect = [
-        b"POST /configure HTTP/1.1\r\nHost: localhost\r\n\r\nssid=TestSSID&password=TestPass123",
-        b"",
-    ]
+    mock_client = _client(
+        b"POST /configure HTTP/1.1\r\nHost: localhost\r\nContent-Length: 34\r\n\r\n"
+        b"ssid=TestSSID&password=TestPass123",
+    )
     server = WebServer(mock_manager, debug=True)
+    mock_handle_configure = Mock(return_value=None)
+    server.route("/configure", mock_handle_configure, ("POST",))
 
-    with patch.object(server, "handle_configure") as mock_handle_configure:
-        server._handle_client(mock_client)
+    server._handle_client(mock_client)
 
-        # Verify the configure handler was called
-        mock_handle_configure.assert_called_once_with(
-            mock_client,
-            b"POST /configure HTTP/1.1\r\nHost: localhost\r\n\r\n"
-            b"ssid=TestSSID&password=TestPass123",
-        )
+    # Verify the configure handler was called
+    mock_handle_configure.assert_called_once()
+    _, client, request = mock_handle_configure.call_args[0]
+    assert client is mock_client
+    assert request.method == "POST"
+    assert request.path == "/configure"
+    assert request.headers["host"] == "localhost"
+    assert request.body == b"ssid=TestSSID&password=TestPass123"
 
     # Verify the client connection was closed
     mock_client.close.assert_called_once()
@@ -196,27 +452,147 @@ def test_handle_client_configure(mock_manager):
 
 def test_handle_client_not_found(mock_manager):
     """Test handling a client request for an unknown URL."""
-    mock_client = Mock()
-    mock_client.recv.side_effect = [
-        b"GET /unknown HTTP/1.1\r\nHost: localhost\r\n\r\n",
-        b"",
-    ]
+    mock_client = _client(b"GET /unknown HTTP/1.1\r\nHost: localhost\r\n\r\n")
     server = WebServer(mock_manager, debug=True)
 
-    with patch.object(server, "handle_not_found") as mock_handle_not_found:
+    with patch.object(WebServer, "handle_not_found") as mock_handle_not_found:
         server._handle_client(mock_client)
 
         # Verify the not found handler was called
-        mock_handle_not_found.assert_called_once_with(mock_client)
+        mock_handle_not_found.assert_called_once()
+        assert mock_handle_not_found.call_args[0][0] is mock_client
 
     # Verify the client connection was closed
     mock_client.close.assert_called_once()
 
 
+def test_route_registers_application_pages(mock_manager):
+    def settings(server, client, request):
+        server.send_json(client, '{"interval":%s}' % request.query.split("=")[1])
+
+    server = WebServer(mock_manager)
+    server.route("/settings/", settings, ("GET", "POST"))
+    client = _client(b"GET /settings?interval=5 HTTP/1.1\r\nConnection: close\r\n\r\n")
+    server._handle_client(client)
+    response = bytes(client.sendall.call_args[0][0])
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert response.endswith(b'{"interval":5}')
+    # Routes belong to the server they were added to
+    assert "/settings" not in WebServer(mock_manager).routes
+
+
+def test_handle_logs(mock_manager):
+    import json
+
+    server = WebServer(mock_manager)
+    server.blocking_keep_alive = True
+    mock_manager.wlan_sta.ifconfig.return_value = ["192.168.1.2"]
+    mock_manager.logger.clock = lambda: 42
+    mock_manager.logger.warning("Connection failed: %s", "timeout")
+    client = _client(
+        b"POST /configure HTTP/1.1\r\nContent-Length: 26\r\n\r\nssid=Kimmies&password=1234",
+        b"GET /logs HTTP/1.1\r\nConnection: close\r\n\r\n",
+    )
+    responses = []
+    client.sendall.side_effect = lambda data: responses.append(bytes(data))
+    server._handle_client(client)
+    entries = json.loads(responses[-1].split(b"\r\n\r\n", 1)[1])
+    assert entries == [[42, "WARNING", "Connection failed: timeout"]]
+    # Submitted passwords are never logged
+    assert b"1234" not in responses[-1]
+
+
+def test_route_method_not_allowed(mock_manager):
+    server = WebServer(mock_manager)
+    client = _client(b"GET /configure HTTP/1.1\r\nConnection: close\r\n\r\n")
+    server._handle_client(client)
+    response = bytes(client.sendall.call_args[0][0])
+    assert response.startswith(b"HTTP/1.1 405 Method Not Allowed\r\n")
+    assert b"Allow: POST\r\n" in response
+    mock_manager.wifi_connect.assert_not_called()
+
+
+def test_handle_client_metrics(mock_manager):
+    import json
+
+    server = WebServer(mock_manager)
+    server._handle_client(_client(b"GET / HTTP/1.1\r\n\r\n"))
+    server._handle_client(_client(b"GET /unknown HTTP/1.1\r\n\r\n"))
+    mock_client = _client(b"GET /metrics HTTP/1.1\r\n\r\n")
+    server._handle_client(mock_client)
+
+    response = bytes(mock_client.sendall.call_args[0][0])
+    headers, body = response.split(b"\r\n\r\n", 1)
+    assert b"Content-Type: application/json" in headers
+    metrics = json.loads(body)
+    assert metrics["counters"]["requests"] == {"/": 1, "not_found": 1}
+    assert metrics["histograms"]["request_ms"]["/"]["count"] == 1
+
+
+def test_handle_client_closes_after_response(mock_manager):
+    """The blocking server does not wait on a kept-alive client while others queue up."""
+    server = WebServer(mock_manager)
+    sent = []
+    mock_client = _client(b"GET /api/status HTTP/1.1\r\n\r\nGET /api/status HTTP/1.1\r\n\r\n")
+    mock_client.sendall.side_effect = lambda data: sent.append(bytes(data))
+    server._handle_client(mock_client)
+    assert len(sent) == 1
+    assert b"Connection: close" in sent[0]
+    mock_client.settimeout.assert_called_once_with(server.client_timeout)
+    mock_client.close.assert_called_once()
+
+
+def test_handle_client_keep_alive(mock_manager):
+    server = WebServer(mock_manager)
+    server.blocking_keep_alive = True
+    sent = []
+    # Two pipelined requests, then a third in a later segment
+    mock_client = _client(
+        b"GET /api/status HTTP/1.1\r\n\r\nGET /api/status HTTP/1.1\r\n\r\n",
+        b"GET /unknown HTTP/1.1\r\nConnection: close\r\n\r\n",
+        b"GET / HTTP/1.1\r\n\r\n",
+    )
+    mock_client.sendall.side_effect = lambda data: sent.append(bytes(data))
+    server._handle_client(mock_client)
+
+    assert len(sent) == 3
+    assert all(b"Connection: keep-alive" in response for response in sent[:2])
+    assert sent[2].startswith(b"HTTP/1.1 404") and b"Connection: close" in sent[2]
+    # The fourth request is never read
+    assert mock_client.readinto.call_count == 2
+    mock_client.close.assert_called_once()
+
+
+def test_handle_client_keep_alive_limits(mock_manager):
+    server = WebServer(mock_manager)
+    server.blocking_keep_alive = True
+    server.max_requests = 2
+    sent = []
+    mock_client = _client(b"GET /api/status HTTP/1.1\r\n\r\n" * 3)
+    mock_client.sendall.side_effect = lambda data: sent.append(bytes(data))
+    server._handle_client(mock_client)
+    # The last allowed request closes the connection
+    assert len(sent) == 2
+    assert b"Connection: close" in sent[1]
+
+    sent.clear()
+    mock_client = _client(b"GET /api/status HTTP/1.0\r\n\r\n", b"GET / HTTP/1.0\r\n\r\n")
+    mock_client.sendall.side_effect = lambda data: sent.append(bytes(data))
+    server._handle_client(mock_client)
+    # HTTP/1.0 clients get one response per connection
+    assert len(sent) == 1
+    assert b"Connection: close" in sent[0]
+
+    # The connection is closed quietly if no new request arrives in time
+    mock_client = _client(b"GET /api/status HTTP/1.1\r\n\r\n", TimeoutError)
+    server._handle_client(mock_client)
+    mock_client.settimeout.assert_called_with(server.idle_timeout)
+    mock_client.close.assert_called_once()
+
+
 def test_handle_client_timeout(mock_manager):
     """Test handling a client request with a timeout."""
-    mock_client = Mock()
-    mock_client.recv.side_effect = TimeoutError  # Simulate a timeout
+    mock_client = _client(TimeoutError)  # Simulate a timeout
     server = WebServer(mock_manager, debug=True)
 
     server._handle_client(mock_client)
@@ -231,14 +607,13 @@ def test_handle_configure_missing_ssid(mock_manager):
     mock_client = Mock()
 
     # Test with empty SSID
-    with patch("wifi_manager.webserver.url_decode", return_value=b"ssid=&password=test123"):
-        server.handle_configure(mock_client, b"")
-        mock_client.sendall.assert_called()
-        # from send_header
-        assert mock_client.send.call_count == 3
-        assert b"HTTP/1.1 400" in mock_client.send.call_args_list[0][0][0]
-        # Verify error message was sent
-        assert b"SSID must be provided!" in mock_client.sendall.call_args[0][0]
+    server.handle_configure(mock_client, _form_request(b"ssid=&password=test123"))
+    # Header and page are sent together
+    mock_client.sendall.assert_called_once()
+    response = bytes(mock_client.sendall.call_args[0][0])
+    assert response.startswith(b"HTTP/1.1 400")
+    # Verify error message was sent
+    assert b"SSID must be provided!" in response
 
 
 def test_handle_configure_missing_parameters(mock_manager):
@@ -247,11 +622,180 @@ def test_handle_configure_missing_parameters(mock_manager):
     mock_client = Mock()
 
     # Test with empty request
-    with patch("wifi_manager.webserver.url_decode", return_value=b""):
-        server.handle_configure(mock_client, b"")
-        mock_client.sendall.assert_called()
-        # from send_header
-        assert mock_client.send.call_count == 3
-        assert b"HTTP/1.1 400" in mock_client.send.call_args_list[0][0][0]
-        # Verify error message was sent
-        assert b"Parameters not found!" in mock_client.sendall.call_args[0][0]
+    server.handle_configure(mock_client, _form_request(b""))
+    # Header and page are sent together
+    mock_client.sendall.assert_called_once()
+    response = bytes(mock_client.sendall.call_args[0][0])
+    assert response.startswith(b"HTTP/1.1 400")
+    # Verify error message was sent
+    assert b"Parameters not found!" in response
+
+
+def _free_port(kind=None):
+    import socket
+
+    with socket.socket(socket.AF_INET, kind or socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_serve_async_concurrent_clients(mock_manager):
+    """A stalled client must not block other clients in the asyncio serving mode."""
+    import asyncio
+
+    server = WebServer(mock_manager)
+    server.sta_poll_interval = 0.01
+    server.captive_dns = False
+    port = _free_port()
+
+    async def scenario():
+        task = asyncio.create_task(server.serve("127.0.0.1", port))
+        await asyncio.sleep(0.05)
+        # Speculative connection that never sends a request
+        _, idle_writer = await asyncio.open_connection("127.0.0.1", port)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /api/networks HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 2)
+        writer.close()
+        idle_writer.close()
+        mock_manager.wlan_sta.isconnected.return_value = True
+        await asyncio.wait_for(task, 2)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert b"TestSSID" in response
+    mock_manager.wlan_ap.active.assert_called_with(False)
+
+
+def test_serve_async_answers_dns(mock_manager):
+    import asyncio
+    import socket
+
+    server = WebServer(mock_manager)
+    server.sta_poll_interval = 0.01
+    server.dns_port = _free_port(socket.SOCK_DGRAM)
+    query = (
+        b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00"
+        b"\x03www\x06google\x03com\x00\x00\x01\x00\x01"
+    )
+
+    async def scenario():
+        task = asyncio.create_task(server.serve("127.0.0.1", _free_port()))
+        await asyncio.sleep(0.05)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as resolver:
+            resolver.settimeout(0)
+            resolver.sendto(query, ("127.0.0.1", server.dns_port))
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                try:
+                    response = resolver.recv(512)
+                    break
+                except BlockingIOError:
+                    pass
+        mock_manager.wlan_sta.isconnected.return_value = True
+        await asyncio.wait_for(task, 2)
+        return response
+
+    response = asyncio.run(scenario())
+    assert response[:2] == b"\x12\x34"
+    assert response.endswith(bytes([192, 168, 4, 1]))
+
+
+def test_serve_async_keep_alive(mock_manager):
+    import asyncio
+
+    server = WebServer(mock_manager)
+    server.sta_poll_interval = 0.01
+    server.captive_dns = False
+    port = _free_port()
+
+    async def read_response(reader):
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(headers.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        return headers, await reader.readexactly(length)
+
+    async def scenario():
+        task = asyncio.create_task(server.serve("127.0.0.1", port))
+        await asyncio.sleep(0.05)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for _ in range(2):
+            writer.write(b"GET /api/status HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            responses.append(await asyncio.wait_for(read_response(reader), 2))
+        writer.close()
+        mock_manager.wlan_sta.isconnected.return_value = True
+        await asyncio.wait_for(task, 2)
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert len(responses) == 2
+    for headers, body in responses:
+        assert b"Connection: keep-alive" in headers
+        assert body == b'{"connected": false, "ip": null}'
+
+
+def test_serve_async_configure_does_not_block_other_clients(mock_manager):
+    """Other clients are served while a configure request waits for the STA to connect."""
+    import asyncio
+    import json
+
+    server = WebServer(mock_manager)
+    server.sta_poll_interval = 0.01
+    server.captive_dns = False
+    port = _free_port()
+    mock_manager.wlan_sta.ifconfig.return_value = ["192.168.1.20"]
+
+    async def scenario():
+        joined = asyncio.Event()
+
+        async def wifi_connect_async(ssid, password):
+            await joined.wait()
+            mock_manager.wlan_sta.isconnected.return_value = True
+            return True
+
+        mock_manager.wifi_connect_async = wifi_connect_async
+        task = asyncio.create_task(server.serve("127.0.0.1", port))
+        await asyncio.sleep(0.05)
+        configure_reader, configure_writer = await asyncio.open_connection("127.0.0.1", port)
+        configure_writer.write(
+            b"POST /api/configure HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            b"Content-Length: 25\r\n\r\nssid=Home&password=secret"
+        )
+        await configure_writer.drain()
+        await asyncio.sleep(0.05)
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /api/status HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        status = await asyncio.wait_for(reader.read(), 2)
+        writer.close()
+        # A second configure request waits its turn
+        retry_reader, retry_writer = await asyncio.open_connection("127.0.0.1", port)
+        retry_writer.write(
+            b"POST /api/configure HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            b"Content-Length: 24\r\n\r\nssid=Home&password=other"
+        )
+        await retry_writer.drain()
+        retry = await asyncio.wait_for(retry_reader.read(), 2)
+        retry_writer.close()
+        pending = not task.done()
+
+        joined.set()
+        configure = await asyncio.wait_for(configure_reader.read(), 2)
+        configure_writer.close()
+        await asyncio.wait_for(task, 2)
+        return status, retry, configure, pending
+
+    status, retry, configure, pending = asyncio.run(scenario())
+    assert status.startswith(b"HTTP/1.1 200 OK")
+    assert retry.startswith(b"HTTP/1.1 503")
+    assert pending
+    headers, body = configure.split(b"\r\n\r\n", 1)
+    assert json.loads(body) == {"connected": True, "ip": "192.168.1.20"}
+    assert b"Connection: close" in headers
+    mock_manager.credentials.set.assert_called_once_with("Home", "secret")
+    mock_manager.wifi_connect.assert_not_called()
+    assert server.manager.metrics.snapshot()["counters"]["requests"]["/api/configure"] == 2